@@ -0,0 +1,361 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from face_index import EmbeddingIndex
+
+# On-disk layout: magic, u32 header length, JSON header, then raw arrays each
+# aligned to ARRAY_ALIGNMENT bytes. Arrays are read straight out of a shared
+# read-only mmap, so every worker process maps the same page-cache pages.
+ANN_MAGIC = b'IVF1'
+ANN_PREAMBLE = struct.Struct('<4sI')
+ARRAY_ALIGNMENT = 64
+
+# Product quantization uses 8-bit codes, i.e. 256 centroids per subspace
+PQ_CENTROIDS = 256
+
+
+def _sq_distances(data, centroids, centroid_sq_norms):
+    # ||x||^2 is constant per row, so it is dropped when only the argmin matters
+    return centroid_sq_norms[np.newaxis, :] - 2.0 * (data @ centroids.T)
+
+
+def _assign(data, centroids, chunk=65536):
+    sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(data.shape[0], dtype=np.int64)
+    for start in range(0, data.shape[0], chunk):
+        block = data[start:start + chunk]
+        labels[start:start + chunk] = np.argmin(_sq_distances(block, centroids, sq_norms), axis=1)
+    return labels
+
+
+def kmeans(data, k, niter=20, seed=0):
+    """Plain Lloyd's k-means; empty clusters are reseeded from random points."""
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float32)
+    if data.shape[0] < k:
+        raise ValueError(f"Need at least {k} training vectors, got {data.shape[0]}")
+    centroids = data[rng.choice(data.shape[0], k, replace=False)].copy()
+    for _ in range(niter):
+        labels = _assign(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, np.newaxis]
+        if empty.any():
+            centroids[empty] = data[rng.choice(data.shape[0], int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file ANN index with optional product quantization.
+
+    The base index is immutable and normally memory-mapped from a file built
+    offline (see build_ann_index.py). Inserts and deletes made between
+    rebuilds go to a small exact delta index plus a tombstone set, both
+    local to the process; :meth:`resync` rebuilds them from the database's
+    list of keys after a remap or a change made by another process.
+    """
+
+    def __init__(self, centroids, list_offsets, keys, vectors=None, sq_norms=None,
+                 codes=None, codebooks=None, nprobe=8):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.keys = keys
+        self.vectors = vectors
+        self.sq_norms = sq_norms
+        self.codes = codes
+        self.codebooks = codebooks
+        self.dim = centroids.shape[1]
+        self.nlist = centroids.shape[0]
+        self.nprobe = nprobe
+        self.path = None
+        self._mmap = None
+        self._centroid_sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+        self._lock = threading.RLock()
+        self._delta = EmbeddingIndex(self.dim, capacity=64)
+        self._delta.loaded = True
+        self._deleted = set()
+        self._deleted_keys = np.zeros(0, dtype=np.int64)
+
+    @property
+    def pq_m(self):
+        return 0 if self.codes is None else self.codes.shape[1]
+
+    def __len__(self):
+        return int(self.keys.shape[0]) - len(self._deleted) + len(self._delta)
+
+    @property
+    def pending_changes(self):
+        """Number of inserts/deletes applied since the base index was built."""
+        return len(self._deleted) + len(self._delta)
+
+    # -- building -----------------------------------------------------------
+
+    @classmethod
+    def build(cls, keys, vectors, nlist=None, pq_m=0, niter=20, train_size=None, seed=0):
+        keys = np.asarray(keys, dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        count, dim = vectors.shape
+        if nlist is None:
+            nlist = max(1, min(count, int(4 * np.sqrt(count))))
+        if pq_m and dim % pq_m:
+            raise ValueError(f"pq_m must divide the embedding dimension {dim}")
+
+        rng = np.random.default_rng(seed)
+        train_size = train_size or min(count, max(nlist * 64, PQ_CENTROIDS * 64))
+        train = vectors[rng.choice(count, min(train_size, count), replace=False)]
+        centroids = kmeans(train, nlist, niter=niter, seed=seed)
+
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind='stable')
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=nlist), out=list_offsets[1:])
+        keys = keys[order]
+        vectors = vectors[order]
+        labels = labels[order]
+
+        if not pq_m:
+            return cls(centroids, list_offsets, keys, vectors=vectors,
+                       sq_norms=np.einsum('ij,ij->i', vectors, vectors))
+
+        # PQ encodes residuals to the coarse centroid, one codebook per subspace
+        dsub = dim // pq_m
+        residuals = vectors - centroids[labels]
+        train_residuals = residuals[rng.choice(count, min(train.shape[0], count), replace=False)]
+        codebooks = np.empty((pq_m, PQ_CENTROIDS, dsub), dtype=np.float32)
+        codes = np.empty((count, pq_m), dtype=np.uint8)
+        for j in range(pq_m):
+            sub = slice(j * dsub, (j + 1) * dsub)
+            codebooks[j] = kmeans(train_residuals[:, sub], PQ_CENTROIDS, niter=niter, seed=seed + j)
+            codes[:, j] = _assign(np.ascontiguousarray(residuals[:, sub]), codebooks[j])
+        return cls(centroids, list_offsets, keys, codes=codes, codebooks=codebooks)
+
+    # -- persistence ----------------------------------------------------------
+
+    def _arrays(self):
+        arrays = {
+            'centroids': self.centroids,
+            'list_offsets': self.list_offsets,
+            'keys': self.keys,
+        }
+        if self.codes is None:
+            arrays['vectors'] = self.vectors
+            arrays['sq_norms'] = self.sq_norms
+        else:
+            arrays['codes'] = self.codes
+            arrays['codebooks'] = self.codebooks
+        return arrays
+
+    def save(self, path):
+        """Write the base index atomically (tmp file + rename)."""
+        arrays = {name: np.ascontiguousarray(a) for name, a in self._arrays().items()}
+        layout = {}
+        offset = 0
+        for name, array in arrays.items():
+            offset = -(-offset // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+            layout[name] = {
+                'dtype': array.dtype.newbyteorder('<').str,
+                'shape': list(array.shape),
+                'offset': offset,
+            }
+            offset += array.nbytes
+        header = json.dumps({'dim': self.dim, 'nlist': self.nlist, 'pq_m': self.pq_m,
+                             'arrays': layout}).encode('utf-8')
+        data_start = -(-(ANN_PREAMBLE.size + len(header)) // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(ANN_PREAMBLE.pack(ANN_MAGIC, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(array.astype(layout[name]['dtype'], copy=False).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, nprobe=8):
+        """Memory-map an index file; arrays are zero-copy read-only views."""
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_len = ANN_PREAMBLE.unpack_from(mm)
+        if magic != ANN_MAGIC:
+            mm.close()
+            raise ValueError(f"{path} is not an ANN index file")
+        header = json.loads(mm[ANN_PREAMBLE.size:ANN_PREAMBLE.size + header_len])
+        data_start = -(-(ANN_PREAMBLE.size + header_len) // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+        arrays = {}
+        for name, meta in header['arrays'].items():
+            dtype = np.dtype(meta['dtype'])
+            count = int(np.prod(meta['shape'], dtype=np.int64))
+            arrays[name] = np.frombuffer(mm, dtype=dtype, count=count,
+                                         offset=data_start + meta['offset']).reshape(meta['shape'])
+        index = cls(nprobe=nprobe, **arrays)
+        index.path = path
+        index._mmap = mm
+        return index
+
+    def close(self):
+        # Views into the mmap must be dropped before it can be closed
+        self.centroids = self.list_offsets = self.keys = None
+        self.vectors = self.sq_norms = self.codes = self.codebooks = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # A caller still holds a view; the GC will unmap it
+            self._mmap = None
+
+    # -- incremental updates --------------------------------------------------
+
+    def upsert(self, key, vector):
+        key = int(key)
+        with self._lock:
+            if vector is None:
+                self.remove(key)
+                return
+            self._tombstone(key)
+            self._delta.upsert(key, vector)
+
+    def remove(self, key):
+        key = int(key)
+        with self._lock:
+            self._tombstone(key)
+            self._delta.remove(key)
+
+    def resync(self, keys, load_vectors):
+        """Add keys the base index lacks and tombstone keys no longer present.
+
+        ``keys`` are all current keys; ``load_vectors(keys)`` returns
+        ``(keys, vectors)`` for the missing ones. An embedding replaced in
+        place keeps its old base vector until the next build unless this
+        process saw the change itself. Returns ``(added, removed)``.
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        with self._lock:
+            missing = np.setdiff1d(keys, self._live_keys())
+        loaded_keys, vectors = load_vectors(missing.tolist()) if missing.size else ((), ())
+        with self._lock:
+            gone = np.setdiff1d(self._live_keys(), keys)
+            for key in gone.tolist():
+                if not self._delta.remove(key):
+                    self._deleted.add(key)
+            self._deleted_keys = np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted))
+            # Missing keys are absent from the base or already tombstoned there
+            for key, vector in zip(loaded_keys, vectors):
+                self._delta.upsert(int(key), vector)
+        return len(loaded_keys), int(gone.size)
+
+    def _live_keys(self):
+        base = self.keys
+        if self._deleted:
+            base = base[~np.isin(base, self._deleted_keys)]
+        return np.concatenate([base, self._delta.keys()])
+
+    def _tombstone(self, key):
+        if key not in self._deleted:
+            self._deleted.add(key)
+            self._deleted_keys = np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted))
+
+    # -- search ---------------------------------------------------------------
+
+    def _search_one(self, query, k, nprobe, deleted_keys):
+        coarse = self._centroid_sq_norms - 2.0 * (self.centroids @ query)
+        if nprobe < self.nlist:
+            probes = np.argpartition(coarse, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(self.nlist)
+        query_sq_norm = float(query @ query)
+
+        cand_keys = []
+        cand_dist = []
+        for probe in probes:
+            start, end = self.list_offsets[probe], self.list_offsets[probe + 1]
+            if start == end:
+                continue
+            if self.codes is None:
+                dist = self.sq_norms[start:end] - 2.0 * (self.vectors[start:end] @ query)
+                dist += query_sq_norm
+            else:
+                # Asymmetric distance: lookup table of residual-to-codeword distances
+                residual = (query - self.centroids[probe]).reshape(self.pq_m, 1, -1)
+                table = ((self.codebooks - residual) ** 2).sum(axis=2)
+                dist = table[np.arange(self.pq_m), self.codes[start:end]].sum(axis=1)
+            cand_keys.append(self.keys[start:end])
+            cand_dist.append(dist)
+
+        if cand_keys:
+            keys = np.concatenate(cand_keys)
+            dist = np.concatenate(cand_dist)
+            if deleted_keys.size:
+                live = ~np.isin(keys, deleted_keys)
+                keys, dist = keys[live], dist[live]
+        else:
+            keys = np.zeros(0, dtype=np.int64)
+            dist = np.zeros(0, dtype=np.float32)
+
+        if k < keys.shape[0]:
+            top = np.argpartition(dist, k - 1)[:k]
+            keys, dist = keys[top], dist[top]
+        np.maximum(dist, 0, out=dist)
+        return keys, np.sqrt(dist).astype(np.float32)
+
+    def search(self, queries, k=1, nprobe=None):
+        """Approximate k-NN; returns per-query lists of key and distance arrays.
+
+        ``nprobe`` (number of inverted lists scanned) trades latency for
+        recall; it defaults to the value the index was loaded with.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        if queries.ndim != 2 or queries.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d query embeddings")
+        nprobe = max(1, min(int(nprobe or self.nprobe), self.nlist))
+        k = int(k)
+
+        with self._lock:
+            deleted_keys = self._deleted_keys
+            delta_keys, delta_dist = self._delta.search(queries, k)
+
+        result_keys = []
+        result_dist = []
+        for i, query in enumerate(queries):
+            keys, dist = self._search_one(query, k, nprobe, deleted_keys)
+            keys = np.concatenate([keys, delta_keys[i]])
+            dist = np.concatenate([dist, delta_dist[i]])
+            order = np.argsort(dist, kind='stable')[:k]
+            result_keys.append(keys[order])
+            result_dist.append(dist[order])
+        return result_keys, result_dist
+
+
+def recall_report(index, exact, queries, k=10, nprobes=(1, 2, 4, 8, 16, 32)):
+    """Measure recall@k and per-query latency of ``index`` against exact search."""
+    exact_keys, _ = exact.search(queries, k)
+    report = []
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            break
+        start = time.perf_counter()
+        ann_keys, _ = index.search(queries, k, nprobe=nprobe)
+        elapsed = time.perf_counter() - start
+        hits = sum(
+            np.intersect1d(found, truth).shape[0]
+            for found, truth in zip(ann_keys, exact_keys)
+        )
+        report.append({
+            'nprobe': nprobe,
+            'recall': hits / float(exact_keys.size or 1),
+            'ms_per_query': elapsed * 1000.0 / len(queries),
+        })
+    return report
+
@@ -0,0 +1,86 @@
+import csv
+import datetime
+import io
+import json
+
+from sqlalchemy import select, tuple_
+
+# Export columns, in order
+COLUMNS = ('id', 'timestamp', 'user_id', 'student_id', 'name', 'latitude', 'longitude')
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def parse_bound(value):
+    """Parse an ISO date or datetime query argument; None passes through."""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+
+
+def attendance_query(location_table, user_table, course_id, start=None, end=None):
+    """SELECT of a course's check-ins with student names, in (timestamp, id) order."""
+    query = (
+        select(location_table.c.id, location_table.c.timestamp, location_table.c.student_id,
+               user_table.c.student_id, user_table.c.name,
+               location_table.c.latitude, location_table.c.longitude)
+        .join_from(location_table, user_table, user_table.c.id == location_table.c.student_id)
+        .where(location_table.c.course_id == course_id,
+               location_table.c.timestamp.isnot(None))
+        .order_by(location_table.c.timestamp, location_table.c.id)
+    )
+    if start is not None:
+        query = query.where(location_table.c.timestamp >= start)
+    if end is not None:
+        query = query.where(location_table.c.timestamp < end)
+    return query
+
+
+def iter_attendance_pages(engine, query, location_table, page_size=1000):
+    """Yield lists of row tuples, one keyset page at a time.
+
+    Every page is a separate short query that resumes after the last
+    ``(timestamp, id)`` seen, so no connection or cursor is held while the
+    client reads and memory stays bounded by ``page_size``.
+    """
+    key = tuple_(location_table.c.timestamp, location_table.c.id)
+    last = None
+    while True:
+        page_query = query if last is None else query.where(key > tuple_(*last))
+        with engine.connect() as connection:
+            rows = connection.execute(page_query.limit(page_size)).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last = (rows[-1][1], rows[-1][0])
+
+
+def _row_values(row):
+    timestamp = row[1]
+    return (row[0], timestamp.isoformat() if timestamp else None) + tuple(row[2:])
+
+
+def csv_chunks(pages, header=True):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow(COLUMNS)
+        yield buffer.getvalue()
+    for rows in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_row_values(row) for row in rows)
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(pages):
+    for rows in pages:
+        yield ''.join(json.dumps(dict(zip(COLUMNS, _row_values(row))), ensure_ascii=False) + '\n'
+                      for row in rows)
@@ -0,0 +1,254 @@
+import datetime
+import logging
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# A state change waiting to be written: kind is 'open', 'close' or 'radius'
+# (the radius of an open session changed)
+SessionEvent = namedtuple('SessionEvent', ['kind', 'course_id', 'at', 'radius'])
+
+
+class SessionState:
+    __slots__ = ('course_id', 'opened_at', 'closed_at', 'radius')
+
+    def __init__(self, course_id, opened_at, closed_at=None, radius=None):
+        self.course_id = course_id
+        self.opened_at = opened_at
+        self.closed_at = closed_at
+        self.radius = radius
+
+    @property
+    def is_open(self):
+        return self.closed_at is None
+
+    def to_dict(self):
+        return {
+            'course_id': self.course_id,
+            'opened_at': self.opened_at.isoformat() if self.opened_at else None,
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None,
+            'radius': self.radius,
+            'isOpen': self.is_open
+        }
+
+
+class AttendanceSessionEngine:
+    """Per-process cache of the open/closed state per course.
+
+    The database is the source of truth: the state is loaded from it and
+    reloaded after :meth:`invalidate` (another process changed it). Opening or
+    closing only touches a dict and appends to a queue; a daemon writer thread
+    persists the events in order through ``persist(events)``, retrying with
+    backoff while the database is busy, so request threads never wait on a
+    database lock. Until its events are written a course keeps its local
+    state across reloads.
+
+    Only errors ``is_transient(error)`` accepts are retried, and at most
+    ``max_attempts`` times. An event that still fails is dropped: it is
+    logged, kept in :attr:`dead_letters`, and the state is reloaded from the
+    database so it no longer shows the lost change.
+    """
+
+    def __init__(self, persist, batch_size=256, max_retry_delay=5.0,
+                 is_transient=None, max_attempts=8, dead_letter_size=100):
+        self.loaded = False
+        self.persisted = 0
+        self.failures = 0
+        self.dropped = 0
+        # (event, error message) of the most recent dropped events
+        self.dead_letters = deque(maxlen=dead_letter_size)
+        self._persist = persist
+        self._batch_size = batch_size
+        self._max_retry_delay = max_retry_delay
+        self._is_transient = is_transient or (lambda error: False)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._courses = set()
+        self._sessions = {}
+        # course_id -> queued events not yet written
+        self._unsaved = {}
+        # Bumped by invalidate() and by every write; a load that read the
+        # database across one is applied but leaves the state unloaded
+        self._epoch = 0
+        self._queue = queue.Queue()
+        self._writer = None
+
+    @property
+    def epoch(self):
+        return self._epoch
+
+    def load(self, course_ids, open_sessions, epoch=None):
+        """Seed state from the database: all course ids plus the open sessions.
+
+        ``epoch`` is :attr:`epoch` from before the database was read. Courses
+        with unsaved events keep their local state.
+        """
+        with self._lock:
+            courses = set(course_ids)
+            sessions = {state.course_id: state for state in open_sessions}
+            for course_id in self._unsaved:
+                courses.add(course_id)
+                sessions.pop(course_id, None)
+                if course_id in self._sessions:
+                    sessions[course_id] = self._sessions[course_id]
+            self._courses = courses
+            self._sessions = sessions
+            self.loaded = epoch is None or epoch == self._epoch
+
+    def invalidate(self):
+        """Reload from the database on next use; queued events are kept."""
+        with self._lock:
+            self._epoch += 1
+            self.loaded = False
+
+    # -- state ----------------------------------------------------------------
+
+    def has_course(self, course_id):
+        return course_id in self._courses
+
+    def register_course(self, course_id):
+        with self._lock:
+            self._courses.add(course_id)
+
+    def forget_course(self, course_id):
+        with self._lock:
+            self._courses.discard(course_id)
+            self._sessions.pop(course_id, None)
+
+    def is_open(self, course_id, default=False):
+        if not self.loaded and course_id not in self._unsaved:
+            return default
+        state = self._sessions.get(course_id)
+        return state is not None and state.is_open
+
+    def get(self, course_id):
+        return self._sessions.get(course_id)
+
+    def open_course_ids(self):
+        return [course_id for course_id, state in self._sessions.items() if state.is_open]
+
+    def open(self, course_id, radius=None):
+        """Open attendance; returns the (possibly already open) session.
+
+        Opening an open session with a different ``radius`` changes its radius.
+        """
+        with self._lock:
+            state = self._sessions.get(course_id)
+            if state is not None and state.is_open:
+                if radius is not None and radius != state.radius:
+                    state.radius = radius
+                    self._enqueue(SessionEvent('radius', course_id, datetime.datetime.utcnow(), radius))
+                return state
+            state = SessionState(course_id, datetime.datetime.utcnow(), radius=radius)
+            self._sessions[course_id] = state
+            self._enqueue(SessionEvent('open', course_id, state.opened_at, radius))
+            return state
+
+    def close(self, course_id):
+        """Close attendance; returns the closed session or None if none was open."""
+        with self._lock:
+            state = self._sessions.get(course_id)
+            if state is None or not state.is_open:
+                return state
+            state.closed_at = datetime.datetime.utcnow()
+            self._enqueue(SessionEvent('close', course_id, state.closed_at, state.radius))
+            return state
+
+    # -- background persistence -----------------------------------------------
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def _enqueue(self, event):
+        # Called with self._lock held
+        self._unsaved[event.course_id] = self._unsaved.get(event.course_id, 0) + 1
+        self._queue.put(event)
+        # Started lazily so a forked worker gets its own writer thread
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(
+                target=self._run, name='attendance-session-writer', daemon=True
+            )
+            self._writer.start()
+
+    def _run(self):
+        while True:
+            events = [self._queue.get()]
+            while len(events) < self._batch_size:
+                try:
+                    events.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(events)
+            except Exception as e:
+                if len(events) == 1:
+                    self._drop(events[0], e)
+                else:
+                    # One at a time, so a bad event does not take the others with it
+                    logger.warning("Persisting %s attendance events failed, retrying individually: %s",
+                                   len(events), e)
+                    for event in events:
+                        try:
+                            self._write([event])
+                        except Exception as event_error:
+                            self._drop(event, event_error)
+            self._settle(events)
+            for _ in events:
+                self._queue.task_done()
+
+    def _write(self, events):
+        """Persist ``events``, retrying transient errors with backoff."""
+        delay = 0.05
+        attempt = 1
+        while True:
+            try:
+                self._persist(events)
+                self.persisted += len(events)
+                return
+            except Exception as e:
+                self.failures += 1
+                if attempt >= self.max_attempts or not self._is_transient(e):
+                    raise
+                logger.warning("Persisting %s attendance events failed (attempt %s), retrying: %s",
+                               len(events), attempt, e)
+                time.sleep(delay)
+                delay = min(delay * 2, self._max_retry_delay)
+                attempt += 1
+
+    def _drop(self, event, error):
+        self.dropped += 1
+        self.dead_letters.append((event, str(error)))
+        logger.error("Dropping attendance event %s for course %s: %s", event.kind, event.course_id, error)
+        self.invalidate()
+
+    def _settle(self, events):
+        with self._lock:
+            self._epoch += 1
+            for event in events:
+                left = self._unsaved.get(event.course_id, 0) - 1
+                if left > 0:
+                    self._unsaved[event.course_id] = left
+                else:
+                    self._unsaved.pop(event.course_id, None)
+
+    def flush(self, timeout=None):
+        """Block until every queued event has been persisted (tests, shutdown)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def stats(self):
+        return {
+            'open_sessions': len(self.open_course_ids()),
+            'pending': self.pending,
+            'persisted': self.persisted,
+            'failures': self.failures,
+            'dropped': self.dropped
+        }
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from face_index import EMBEDDING_DIM, encode_embedding, parse_embedding
+
+# Compares loading N student embeddings from the legacy comma-joined text
+# column against the binary float32 blob column.
+#
+#   python bench_embeddings.py [N ...]     (default: 10000 100000)
+
+
+def build_database(path, vectors):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE text_student (id INTEGER PRIMARY KEY, embedding TEXT)')
+    conn.execute('CREATE TABLE blob_student (id INTEGER PRIMARY KEY, embedding_bin BLOB)')
+    conn.executemany(
+        'INSERT INTO text_student (id, embedding) VALUES (?, ?)',
+        ((i, ','.join(str(float(x)) for x in v)) for i, v in enumerate(vectors, 1))
+    )
+    conn.executemany(
+        'INSERT INTO blob_student (id, embedding_bin) VALUES (?, ?)',
+        ((i, encode_embedding(v)) for i, v in enumerate(vectors, 1))
+    )
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def load_matrix(path, query):
+    start = time.perf_counter()
+    conn = sqlite3.connect(path)
+    rows = conn.execute(query).fetchall()
+    matrix = np.empty((len(rows), EMBEDDING_DIM), dtype=np.float32)
+    for i, (_, value) in enumerate(rows):
+        matrix[i] = parse_embedding(value)
+    conn.close()
+    return time.perf_counter() - start, matrix
+
+
+def table_bytes(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            'SELECT SUM(pgsize) FROM dbstat WHERE name = ?', (table,)
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None  # SQLite built without the dbstat virtual table
+    finally:
+        conn.close()
+
+
+def run(count):
+    vectors = np.random.default_rng(count).normal(size=(count, EMBEDDING_DIM)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        build_database(path, vectors)
+
+        text_time, text_matrix = load_matrix(path, 'SELECT id, embedding FROM text_student')
+        blob_time, blob_matrix = load_matrix(path, 'SELECT id, embedding_bin FROM blob_student')
+        assert np.allclose(text_matrix, blob_matrix)
+
+        print(f"{count} students")
+        for name, table, elapsed in (
+            ('text', 'text_student', text_time),
+            ('blob', 'blob_student', blob_time),
+        ):
+            size = table_bytes(path, table)
+            size = f"{size / 1e6:8.1f} MB" if size else "       n/a"
+            print(f"  {name}: load {elapsed * 1000:9.1f} ms   table {size}")
+        print(f"  speedup: {text_time / blob_time:.1f}x")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        run(size)
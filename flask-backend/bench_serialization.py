@@ -0,0 +1,117 @@
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert
+
+import serializers
+
+# CPU time per serialized course and user: ORM entities + to_dict() + jsonify
+# against Core rows + compiled serializers + serializers.dumps (orjson when
+# installed, and with the stdlib encoder). Bodies are checked to be identical.
+#
+#   python bench_serialization.py [--rows 1000] [--repeat 20]
+
+
+def seed(app_module, rows):
+    db = app_module.db
+    db.session.execute(insert(app_module.User), [
+        {'id': 1, 'email': 'doctor@bench', 'password': 'x', 'student_id': 'D1',
+         'name': 'Doctor', 'role': 'doctor'}
+    ] + [
+        # Half the names are Arabic, so the ASCII escaping path is exercised
+        {'id': i + 2, 'email': f'student{i}@bench', 'password': 'x', 'student_id': f'S{i}',
+         'name': f'طالب {i}' if i % 2 else f'Student {i}', 'role': 'student'}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(app_module.Course), [
+        {'id': i + 1, 'name': f'Course {i}', 'code': f'C{i}', 'description': 'Lectures and labs',
+         'doctor_id': 1, 'enrollment_code': f'E{i}', 'day': 'Sunday', 'time': '10:00',
+         'location': 'Hall 1', 'students_count': rows if i == 0 else 0}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(app_module.StudentCourse),
+                       [{'student_id': i + 2, 'course_id': 1} for i in range(rows)])
+    db.session.commit()
+
+
+def orm_courses(app_module):
+    courses = app_module.db.session.query(app_module.Course).filter_by(doctor_id=1).all()
+    return app_module.jsonify({'success': True, 'courses': [course.to_dict() for course in courses]}).get_data()
+
+
+def orm_users(app_module):
+    session = app_module.db.session
+    Course, StudentCourse, User = app_module.Course, app_module.StudentCourse, app_module.User
+    enrollments = session.query(StudentCourse).filter_by(course_id=1).all()
+    students = session.query(User).filter(User.id.in_([e.student_id for e in enrollments])).all()
+    return app_module.jsonify({'success': True, 'students': [student.to_dict() for student in students]}).get_data()
+
+
+def core_courses(app_module, rows):
+    resource = app_module.COURSE_LIST
+    page = resource.parse({}, rows, rows)
+    result = resource.fetch(app_module.db.session,
+                            resource.select(page).where(app_module.Course.doctor_id == 1), page)
+    return app_module.json_body(app_module.page_payload('courses', result), resource.json_native)
+
+
+def core_users(app_module, rows):
+    resource = app_module.COURSE_STUDENT_LIST
+    StudentCourse, User = app_module.StudentCourse, app_module.User
+    page = resource.parse({}, rows, rows)
+    query = resource.select(page).join_from(
+        StudentCourse, User, StudentCourse.student_id == User.id
+    ).where(StudentCourse.course_id == 1)
+    result = resource.fetch(app_module.db.session, query, page)
+    return app_module.json_body(app_module.page_payload('students', result), resource.json_native)
+
+
+def cpu_per_item(app_module, build, items, repeat):
+    """Median CPU microseconds per item over ``repeat`` runs, and the body."""
+    times = []
+    for _ in range(repeat):
+        app_module.db.session.remove()
+        start = time.process_time()
+        body = build()
+        times.append(time.process_time() - start)
+    times.sort()
+    return times[len(times) // 2] / items * 1e6, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON serialization paths for list endpoints')
+    parser.add_argument('--rows', type=int, default=1000, help='courses and enrolled students')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    import app as app_module
+
+    fast_encoder = serializers.orjson
+    with tempfile.TemporaryDirectory() as tmp:
+        app = app_module.create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+        })
+        with app.app_context():
+            app_module.db.create_all()
+            seed(app_module, args.rows)
+            with app.test_request_context():
+                for name, current, core in (
+                    ('course', lambda: orm_courses(app_module), lambda: core_courses(app_module, args.rows)),
+                    ('user', lambda: orm_users(app_module), lambda: core_users(app_module, args.rows)),
+                ):
+                    baseline, expected = cpu_per_item(app_module, current, args.rows, args.repeat)
+                    print(f'{name}: {args.rows} rows, CPU time per serialized {name}')
+                    print(f'  ORM + to_dict + jsonify  {baseline:7.1f} us')
+                    encoders = [('orjson', fast_encoder), ('stdlib json', None)] if fast_encoder else [('stdlib json', None)]
+                    for label, encoder in encoders:
+                        serializers.orjson = encoder
+                        elapsed, body = cpu_per_item(app_module, core, args.rows, args.repeat)
+                        assert body == expected, f'{name} body differs with {label}'
+                        print(f'  Core rows + {label:12} {elapsed:7.1f} us   x{baseline / elapsed:.1f}')
+                    serializers.orjson = fast_encoder
+
+
+if __name__ == '__main__':
+    main()
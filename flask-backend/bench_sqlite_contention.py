@@ -0,0 +1,133 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# Read throughput of GET /data while a burst of POST /data writes is running,
+# for the legacy single-pool setup and for WAL mode with separate read/write
+# pools. Each storage mode runs in its own process because the mode is fixed
+# when app.py is imported.
+#
+#   python bench_sqlite_contention.py [--seconds 3] [--readers 8] [--writers 4]
+
+
+def hammer(client_factory, method, path, stop, latencies, errors, payload=None):
+    client = client_factory()
+    while not stop.is_set():
+        start = time.perf_counter()
+        if method == 'GET':
+            response = client.get(path)
+        else:
+            response = client.post(path, json=payload)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+
+
+def phase(app, seconds, readers, writers):
+    stop = threading.Event()
+    read_latencies, write_latencies, errors = [], [], []
+    threads = [
+        threading.Thread(target=hammer, args=(app.test_client, 'GET', '/data', stop,
+                                              read_latencies, errors))
+        for _ in range(readers)
+    ] + [
+        threading.Thread(target=hammer, args=(app.test_client, 'POST', '/data', stop,
+                                              write_latencies, errors,
+                                              {'name': 'bench', 'location': '30.0,31.0'}))
+        for _ in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    def summary(latencies):
+        if not latencies:
+            return {'per_sec': 0.0, 'p50_ms': None, 'p99_ms': None}
+        ms = np.asarray(latencies) * 1000
+        return {
+            'per_sec': len(latencies) / seconds,
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p99_ms': float(np.percentile(ms, 99)),
+        }
+
+    return {'reads': summary(read_latencies), 'writes': summary(write_latencies),
+            'errors': len(errors)}
+
+
+def child(args):
+    logging.disable(logging.CRITICAL)
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import create_app, db, Location
+
+        app = create_app()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all(Location(name=f'room {i}', location='30.0,31.0')
+                               for i in range(args.rows))
+            db.session.commit()
+
+        idle = phase(app, args.seconds, args.readers, 0)
+        burst = phase(app, args.seconds, args.readers, args.writers)
+    print(json.dumps({'idle': idle, 'burst': burst}))
+
+
+def run_mode(mode, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   SQLITE_STORAGE_MODE=mode,
+                   DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'))
+        output = subprocess.run(
+            [sys.executable, __file__, '--child',
+             '--seconds', str(args.seconds), '--readers', str(args.readers),
+             '--writers', str(args.writers), '--rows', str(args.rows)],
+            env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def fmt(value):
+    return '-' if value is None else f'{value:.1f}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite read/write contention benchmark")
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=500, help='Location rows returned by GET /data')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds:.0f}s per phase, '
+          f'{args.rows} rows per read')
+    print(f'{"mode":<8} {"phase":<6} {"reads/s":>9} {"read p50":>9} {"read p99":>9} '
+          f'{"writes/s":>9} {"write p99":>10} {"errors":>7}')
+    for mode in ('legacy', 'wal'):
+        result = run_mode(mode, args)
+        for name in ('idle', 'burst'):
+            reads, writes = result[name]['reads'], result[name]['writes']
+            print(f'{mode:<8} {name:<6} {reads["per_sec"]:>9.0f} {fmt(reads["p50_ms"]):>9} '
+                  f'{fmt(reads["p99_ms"]):>9} {writes["per_sec"]:>9.0f} '
+                  f'{fmt(writes["p99_ms"]):>10} {result[name]["errors"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
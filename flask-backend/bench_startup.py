@@ -0,0 +1,108 @@
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Cold-start benchmark: how long `import app` takes in a fresh interpreter,
+# how long create_app() takes, and how long a freshly started gunicorn worker
+# needs to answer its first request.
+#
+#   python bench_startup.py [--runs 5] [--path /ready]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import wsgi
+print(time.perf_counter() - start)
+"""
+
+IMPORT_ONLY_SCRIPT = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app({'ENABLE_MIGRATIONS': False})
+print(imported - start, time.perf_counter() - imported)
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def first_request(env, path, timeout=30):
+    """Seconds from spawning gunicorn to the first 200 on ``path``."""
+    port = free_port()
+    env = dict(env, WEB_CONCURRENCY='1', BIND=f'127.0.0.1:{port}', PRELOAD_APP='0')
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', path)
+                if conn.getresponse().status == 200:
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError('server did not answer')
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+def describe(name, samples):
+    ms = np.asarray(samples) * 1000
+    print(f'{name:<28} median {np.median(ms):7.0f} ms   min {ms.min():7.0f} ms   max {ms.max():7.0f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import time and time to first request')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/ready', help='first request to wait for')
+    parser.add_argument('--database-url', help='default: a temporary SQLite database')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or 'sqlite:///' + os.path.join(tmp, 'startup.db')
+        env = dict(os.environ, DATABASE_URL=database_url)
+        subprocess.run(
+            [sys.executable, '-c', 'import app; a = app.create_app()\n'
+             'with a.app_context(): app.db.create_all()'],
+            cwd=HERE, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+        imports, creates, wsgi_imports, firsts = [], [], [], []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, '-c', IMPORT_ONLY_SCRIPT], cwd=HERE, env=env,
+                                 check=True, capture_output=True, text=True).stdout.split()
+            imports.append(float(out[-2]))
+            creates.append(float(out[-1]))
+            out = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=HERE, env=env,
+                                 check=True, capture_output=True, text=True).stdout.split()
+            wsgi_imports.append(float(out[-1]))
+            firsts.append(first_request(env, args.path))
+
+    print(f'{args.runs} runs, first request GET {args.path}')
+    describe('import app', imports)
+    describe('create_app()', creates)
+    describe('import wsgi (both)', wsgi_imports)
+    describe('spawn -> first response', firsts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex, recall_report
+from face_index import EMBEDDING_DIM, EmbeddingIndex
+
+# Builds the IVF(-PQ) face index offline and prints recall@k against exact
+# search for a range of nprobe values.
+#
+#   python build_ann_index.py                       (from the Student table)
+#   python build_ann_index.py --synthetic 100000    (random gallery, no DB)
+
+
+def load_gallery_from_db():
+    from app import create_app, load_student_embeddings
+
+    with create_app().app_context():
+        return load_student_embeddings()
+
+
+def synthetic_gallery(count, seed=0):
+    rng = np.random.default_rng(seed)
+    # Identities are drawn around a few hundred cluster centres so the data
+    # has the kind of structure real face embeddings have
+    centres = rng.normal(size=(max(1, count // 200), EMBEDDING_DIM)).astype(np.float32)
+    vectors = centres[rng.integers(0, centres.shape[0], count)]
+    vectors = vectors + 0.5 * rng.normal(size=vectors.shape).astype(np.float32)
+    return np.arange(1, count + 1), vectors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the IVF face index and report recall@k')
+    parser.add_argument('--output', default=None,
+                        help='index file to write (default: app ANN_INDEX_PATH)')
+    parser.add_argument('--nlist', type=int, default=None,
+                        help='number of inverted lists (default: 4*sqrt(N))')
+    parser.add_argument('--pq-m', type=int, default=0,
+                        help='PQ subspaces, must divide %d; 0 stores full vectors' % EMBEDDING_DIM)
+    parser.add_argument('--niter', type=int, default=20)
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='build from N random embeddings instead of the database')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', default='1,2,4,8,16,32,64')
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        keys, vectors = synthetic_gallery(args.synthetic)
+    else:
+        keys, vectors = load_gallery_from_db()
+    if len(keys) == 0:
+        print("No embeddings to index")
+        return 1
+
+    output = args.output
+    if output is None:
+        from app import DEFAULT_CONFIG
+        output = DEFAULT_CONFIG['ANN_INDEX_PATH']
+
+    start = time.perf_counter()
+    index = IVFIndex.build(keys, vectors, nlist=args.nlist, pq_m=args.pq_m, niter=args.niter)
+    index.save(output)
+    print(f"Built {len(keys)} embeddings into {index.nlist} lists "
+          f"(pq_m={index.pq_m}) in {time.perf_counter() - start:.1f}s -> {output}")
+
+    index = IVFIndex.load(output)
+    exact = EmbeddingIndex(capacity=len(keys))
+    exact.load(zip(keys, vectors))
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(keys), min(args.queries, len(keys)), replace=False)
+    queries = vectors[picks] + 0.1 * rng.normal(size=(len(picks), vectors.shape[1])).astype(np.float32)
+
+    print(f"recall@{args.k} over {len(queries)} queries")
+    print(f"{'nprobe':>8} {'recall':>8} {'ms/query':>10}")
+    for row in recall_report(index, exact, queries, k=args.k,
+                             nprobes=[int(n) for n in args.nprobe.split(',')]):
+        print(f"{row['nprobe']:>8} {row['recall']:>8.3f} {row['ms_per_query']:>10.3f}")
+    index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import csv
+import io
+
+from sqlalchemy.exc import DBAPIError
+
+# Marker for NULL in the CSV stream; unambiguous, unlike an empty field
+COPY_NULL = '\\N'
+
+
+def _copy_value(value):
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(value).hex()
+    return value
+
+
+def copy_rows(connection, table, rows, columns=None):
+    """Bulk insert dict ``rows`` into ``table`` and return the row count.
+
+    On PostgreSQL the rows are streamed with ``COPY ... FROM STDIN``; other
+    dialects get a single executemany INSERT. COPY skips SQLAlchemy's
+    Python-side column defaults, so callers pass every value they need.
+    Errors are raised as SQLAlchemy exceptions on every dialect.
+    """
+    if not rows:
+        return 0
+    if columns is None:
+        columns = list(rows[0])
+    if connection.dialect.name != 'postgresql':
+        connection.execute(table.insert(), rows)
+        return len(rows)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row in rows:
+        writer.writerow([_copy_value(row.get(column)) for column in columns])
+    buffer.seek(0)
+
+    preparer = connection.dialect.identifier_preparer
+    statement = (
+        f'COPY {preparer.format_table(table)} '
+        f'({", ".join(preparer.quote(column) for column in columns)}) '
+        f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+    dbapi = connection.dialect.dbapi
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    except dbapi.Error as e:
+        # The raw cursor bypasses SQLAlchemy; wrap the error as execute() would,
+        # so a duplicate raises sqlalchemy.exc.IntegrityError
+        raise DBAPIError.instance(statement, None, e, dbapi.Error, dialect=connection.dialect) from e
+    finally:
+        cursor.close()
+    return len(rows)
+
@@ -0,0 +1,208 @@
+import csv
+import io
+import json
+
+from sqlalchemy import func, select
+
+# Columns a row can identify a student by, in order of preference
+IDENTIFIER_FIELDS = ('student_id', 'email', 'id')
+
+# Per-row outcomes
+ENROLLED = 'enrolled'
+ALREADY_ENROLLED = 'already_enrolled'
+DUPLICATE = 'duplicate'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+class BulkEnrollmentError(ValueError):
+    pass
+
+
+def _identifier(record):
+    """Return ``(field, value)`` for one parsed record, or None."""
+    if isinstance(record, dict):
+        for field in IDENTIFIER_FIELDS:
+            value = record.get(field)
+            if value is not None and str(value).strip():
+                return field, str(value).strip()
+        return None
+    if isinstance(record, (str, int)) and not isinstance(record, bool) and str(record).strip():
+        return 'student_id', str(record).strip()
+    return None
+
+
+def parse_csv(lines):
+    """Yield ``(row_number, identifier)`` from CSV text lines.
+
+    A header naming one of IDENTIFIER_FIELDS selects the column; without one
+    the first column is taken as ``student_id``.
+    """
+    reader = csv.reader(lines)
+    header = None
+    for row_number, row in enumerate(reader, start=1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if header is None and row_number == 1:
+            names = [cell.strip().lower() for cell in row]
+            if any(field in names for field in IDENTIFIER_FIELDS):
+                header = names
+                continue
+        if header is not None:
+            yield row_number, _identifier(dict(zip(header, row)))
+        else:
+            yield row_number, _identifier(row[0])
+
+
+def parse_ndjson(lines):
+    """Yield ``(line_number, identifier)`` from newline-delimited JSON.
+
+    Each line is an object with one of IDENTIFIER_FIELDS, or a bare
+    student_id string or number.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, _identifier(record)
+
+
+def parse_identifiers(stream, fmt, max_rows):
+    """Read a binary or text stream in ``fmt`` ('csv' or 'ndjson') into a row list."""
+    if isinstance(stream, (bytes, str)):
+        stream = io.BytesIO(stream if isinstance(stream, bytes) else stream.encode('utf-8'))
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    parser = parse_csv if fmt == 'csv' else parse_ndjson
+    rows = []
+    for row in parser(stream):
+        rows.append(row)
+        if len(rows) > max_rows:
+            raise BulkEnrollmentError(f'Too many rows (limit {max_rows})')
+    return rows
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _lookup_key(field, value):
+    """The form a value is queried and looked up by; None if it cannot match."""
+    if field == 'id':
+        return str(int(value)) if value.isdecimal() else None
+    if field == 'email':
+        return value.lower()
+    return value
+
+
+def resolve_students(connection, user_table, identifiers, chunk_size=500):
+    """Map ``(field, value)`` identifiers to student user ids with chunked IN queries.
+
+    Keys of the result are ``(field, _lookup_key(field, value))``.
+    """
+    by_field = {}
+    for field, value in identifiers:
+        key = _lookup_key(field, value)
+        if key is not None:
+            by_field.setdefault(field, set()).add(key)
+
+    resolved = {}
+    for field, values in by_field.items():
+        column = user_table.c[field]
+        if field == 'email':
+            # Served by the lower(email) index ix_user_email_lower
+            column = func.lower(column)
+        for chunk in _chunks(values, chunk_size):
+            keys = [int(value) for value in chunk] if field == 'id' else chunk
+            rows = connection.execute(
+                select(column.label('key'), user_table.c.id)
+                .where(column.in_(keys), user_table.c.role == 'student')
+            )
+            for key, user_id in rows:
+                resolved[(field, str(key))] = user_id
+    return resolved
+
+
+def _insert_ignoring_conflicts(connection, enrollment_table, rows):
+    """INSERT ... ON CONFLICT DO NOTHING; returns the student ids actually inserted."""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise BulkEnrollmentError(f'Bulk enrollment is not supported on {dialect}')
+    statement = (
+        insert(enrollment_table).values(rows)
+        .on_conflict_do_nothing(index_elements=['student_id', 'course_id'])
+        .returning(enrollment_table.c.student_id)
+    )
+    return {student_id for (student_id,) in connection.execute(statement)}
+
+
+def enroll_students(connection, tables, course_id, rows, chunk_size=500):
+    """Enroll the identified students in ``course_id`` inside the caller's transaction.
+
+    ``tables`` is ``(user_table, enrollment_table, course_table)``; ``rows`` is
+    the output of :func:`parse_identifiers`. Returns ``(report, inserted
+    student ids)``; ``course.students_count`` is advanced by the number of
+    new enrollments.
+    """
+    user_table, enrollment_table, course_table = tables
+    valid = [identifier for _, identifier in rows if identifier is not None]
+    resolved = resolve_students(connection, user_table, valid, chunk_size)
+
+    report = []
+    to_insert = []
+    seen = set()
+    for row_number, identifier in rows:
+        entry = {'row': row_number}
+        if identifier is None:
+            entry['status'] = INVALID
+            report.append(entry)
+            continue
+        field, value = identifier
+        entry[field] = value
+        user_id = resolved.get((field, _lookup_key(field, value)))
+        if user_id is None:
+            entry['status'] = NOT_FOUND
+        elif user_id in seen:
+            entry['status'] = DUPLICATE
+            entry['user_id'] = user_id
+        else:
+            seen.add(user_id)
+            entry['user_id'] = user_id
+            to_insert.append(user_id)
+        report.append(entry)
+
+    inserted = set()
+    for chunk in _chunks(to_insert, chunk_size):
+        inserted |= _insert_ignoring_conflicts(
+            connection, enrollment_table,
+            [{'student_id': user_id, 'course_id': course_id} for user_id in chunk]
+        )
+    if inserted:
+        connection.execute(
+            course_table.update()
+            .where(course_table.c.id == course_id)
+            .values(students_count=course_table.c.students_count + len(inserted))
+        )
+
+    for entry in report:
+        if 'status' not in entry:
+            entry['status'] = ENROLLED if entry['user_id'] in inserted else ALREADY_ENROLLED
+    return report, inserted
+
+
+def summarize(report):
+    summary = {status: 0 for status in (ENROLLED, ALREADY_ENROLLED, DUPLICATE, NOT_FOUND, INVALID)}
+    for entry in report:
+        summary[entry['status']] += 1
+    summary['rows'] = len(report)
+    return summary
@@ -0,0 +1,180 @@
+import csv
+import io
+import json
+import logging
+import time
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from bulk_copy import copy_rows
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('email', 'password', 'student_id', 'name', 'role')
+ROLES = ('student', 'doctor')
+
+# Per-row outcomes
+CREATED = 'created'
+EXISTS = 'exists'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+
+
+def read_user_records(stream, fmt):
+    """Yield ``(row_number, record)`` from a CSV (with header) or NDJSON stream.
+
+    ``record`` is None for a line that cannot be parsed.
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row_number, record in enumerate(reader, start=2):
+            yield row_number, {key.strip().lower(): (value or '').strip()
+                               for key, value in record.items() if key}
+        return
+    for row_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield row_number, record if isinstance(record, dict) else None
+
+
+def _invalid_reason(record):
+    if record is None:
+        return 'unreadable record'
+    missing = [field for field in REQUIRED_FIELDS if not str(record.get(field) or '').strip()]
+    if missing:
+        return f'missing {", ".join(missing)}'
+    if record['role'] not in ROLES:
+        return f'role must be one of {", ".join(ROLES)}'
+    return None
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _existing(connection, column, values, chunk_size):
+    found = set()
+    values = list(values)
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        found.update(connection.execute(select(column).where(column.in_(chunk))).scalars())
+    return found
+
+
+class UserProvisioner:
+    """Streams user records into the ``user`` table in batches.
+
+    Each batch is validated, checked for emails and student ids that exist
+    in the file or the database with two set-based queries, and its
+    passwords handed to a PasswordHasher. Hashing of batch N+1 overlaps the
+    insert of batch N, which uses COPY on PostgreSQL.
+    """
+
+    def __init__(self, engine, user_table, hasher, batch_size=1000, chunk_size=500):
+        self.engine = engine
+        self.user_table = user_table
+        self.hasher = hasher
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.report = []
+        self.created = 0
+        self._seen_emails = set()
+        self._seen_student_ids = set()
+
+    def run(self, records):
+        """Provision ``records`` (from :func:`read_user_records`); returns the summary."""
+        started = time.perf_counter()
+        pending = None
+        for batch in _batched(records, self.batch_size):
+            accepted = self._check(batch)
+            futures = self.hasher.submit([row['password'] for _, row in accepted])
+            if pending:
+                self._insert(*pending)
+            pending = (accepted, futures)
+        if pending:
+            self._insert(*pending)
+        self.report.sort(key=lambda entry: entry['row'])
+        return self.summary(time.perf_counter() - started)
+
+    def _check(self, batch):
+        candidates = []
+        for row_number, record in batch:
+            reason = _invalid_reason(record)
+            if reason:
+                self.report.append({'row': row_number, 'status': INVALID, 'message': reason})
+                continue
+            record = {field: str(record[field]).strip() for field in REQUIRED_FIELDS}
+            if record['email'] in self._seen_emails or record['student_id'] in self._seen_student_ids:
+                self.report.append({'row': row_number, 'email': record['email'], 'status': DUPLICATE})
+                continue
+            self._seen_emails.add(record['email'])
+            self._seen_student_ids.add(record['student_id'])
+            candidates.append((row_number, record))
+
+        with self.engine.connect() as connection:
+            emails = _existing(connection, self.user_table.c.email,
+                               {record['email'] for _, record in candidates}, self.chunk_size)
+            student_ids = _existing(connection, self.user_table.c.student_id,
+                                    {record['student_id'] for _, record in candidates}, self.chunk_size)
+        accepted = []
+        for row_number, record in candidates:
+            if record['email'] in emails or record['student_id'] in student_ids:
+                self.report.append({'row': row_number, 'email': record['email'], 'status': EXISTS})
+            else:
+                accepted.append((row_number, record))
+        return accepted
+
+    def _insert(self, accepted, futures):
+        if not accepted:
+            return
+        hashes = self.hasher.collect(futures)
+        rows = [{
+            'email': record['email'],
+            'password': password_hash,
+            'student_id': record['student_id'],
+            'name': record['name'],
+            'role': record['role'],
+        } for (_, record), password_hash in zip(accepted, hashes)]
+        try:
+            with self.engine.begin() as connection:
+                copy_rows(connection, self.user_table, rows)
+        except IntegrityError:
+            # An account was created concurrently; insert the batch row by row
+            logger.warning("Batch of %s users conflicted, inserting one by one", len(rows))
+            for (row_number, record), row in zip(accepted, rows):
+                try:
+                    with self.engine.begin() as connection:
+                        connection.execute(self.user_table.insert(), row)
+                except IntegrityError:
+                    self.report.append({'row': row_number, 'email': record['email'], 'status': EXISTS})
+                    continue
+                self.report.append({'row': row_number, 'email': record['email'], 'status': CREATED})
+                self.created += 1
+            return
+        self.report.extend({'row': row_number, 'email': record['email'], 'status': CREATED}
+                           for row_number, record in accepted)
+        self.created += len(rows)
+
+    def summary(self, seconds):
+        counts = {status: 0 for status in (CREATED, EXISTS, DUPLICATE, INVALID)}
+        for entry in self.report:
+            counts[entry['status']] += 1
+        counts['rows'] = len(self.report)
+        counts['seconds'] = round(seconds, 3)
+        counts['users_per_second'] = round(self.created / seconds, 1) if seconds else 0.0
+        counts['hash_workers'] = self.hasher.workers
+        return counts
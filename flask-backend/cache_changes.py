@@ -0,0 +1,134 @@
+import datetime
+import logging
+import threading
+import time
+
+from sqlalchemy import func, or_, select
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeWatch:
+    """Follows an append-only table of changes that per-process caches depend on.
+
+    A write records ``(name, key)`` rows in its own transaction
+    (:meth:`record`), for example ``('courses', 3)``. Rows are only ever
+    inserted, so writers never wait on each other. Each process reads the rows
+    added since its last poll (:meth:`poll`) and passes the keys of each name
+    to the handlers registered for it; a key of None means "everything".
+
+    Ids come from a sequence, so a transaction that commits late can add an id
+    below ones already read. Such gaps are read again on every poll for
+    ``gap_timeout`` seconds, after which they are given up (a rolled-back
+    insert leaves a gap forever). Rows this process committed itself,
+    reported through :meth:`committed`, are already applied to its caches
+    and are skipped.
+    """
+
+    def __init__(self, table, interval=1.0, gap_timeout=60.0, retention=3600.0, max_gaps=1000):
+        self.table = table
+        self.interval = interval
+        self.gap_timeout = gap_timeout
+        self.retention = retention
+        self.max_gaps = max_gaps
+        self.polls = 0
+        self.changes = 0
+        self.last_id = None
+        self._handlers = {}
+        # id -> monotonic time it was found missing
+        self._gaps = {}
+        self._own = set()
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+
+    def on_change(self, name, handler):
+        """Call ``handler(keys)`` with the set of changed keys of ``name``."""
+        self._handlers.setdefault(name, []).append(handler)
+
+    def record(self, connection, name, key=None):
+        """Insert a change row inside the caller's transaction; returns its id."""
+        result = connection.execute(self.table.insert().values(
+            name=name, key=key, created_at=datetime.datetime.utcnow()
+        ))
+        return result.inserted_primary_key[0]
+
+    def committed(self, ids):
+        """Record ids this process inserted and committed, so polls skip them."""
+        with self._lock:
+            self._own.update(ids)
+
+    def poll(self, engine):
+        """Run the handlers for rows other processes added; returns the changed names.
+
+        The first poll only records the newest id, so it must happen before
+        anything is cached. Skipped while another thread is polling.
+        """
+        if not self._poll_lock.acquire(blocking=False):
+            return []
+        try:
+            table = self.table
+            with engine.connect() as connection:
+                if self.last_id is None:
+                    self.last_id = connection.execute(select(func.max(table.c.id))).scalar() or 0
+                    return []
+                condition = table.c.id > self.last_id
+                if self._gaps:
+                    condition = or_(condition, table.c.id.in_(list(self._gaps)))
+                rows = connection.execute(
+                    select(table.c.id, table.c.name, table.c.key).where(condition).order_by(table.c.id)
+                ).all()
+            self.polls += 1
+            now = time.monotonic()
+            changed = {}
+            for row_id, name, key in rows:
+                if row_id > self.last_id:
+                    for missing in range(self.last_id + 1, row_id):
+                        self._gaps[missing] = now
+                    self.last_id = row_id
+                else:
+                    self._gaps.pop(row_id, None)
+                with self._lock:
+                    own = row_id in self._own
+                    self._own.discard(row_id)
+                if not own and name in self._handlers:
+                    changed.setdefault(name, set()).add(key)
+            for gap, found in list(self._gaps.items()):
+                if now - found > self.gap_timeout:
+                    del self._gaps[gap]
+            if len(self._gaps) > self.max_gaps:
+                for gap in sorted(self._gaps)[:len(self._gaps) - self.max_gaps]:
+                    del self._gaps[gap]
+        finally:
+            self._poll_lock.release()
+        for name, keys in changed.items():
+            self.changes += 1
+            for handler in self._handlers[name]:
+                try:
+                    handler(keys)
+                except Exception as e:
+                    logger.error("Handling a change of %s failed: %s", name, e)
+        return list(changed)
+
+    def prune(self, engine):
+        """Delete rows older than ``retention`` seconds; returns how many."""
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.retention)
+        with engine.begin() as connection:
+            return connection.execute(
+                self.table.delete().where(self.table.c.created_at < cutoff)
+            ).rowcount
+
+    def reset(self):
+        """Forget the position, gaps and own ids; the next poll starts over."""
+        with self._poll_lock, self._lock:
+            self.last_id = None
+            self._gaps.clear()
+            self._own.clear()
+
+    def stats(self):
+        return {
+            'last_id': self.last_id,
+            'gaps': len(self._gaps),
+            'polls': self.polls,
+            'changes': self.changes,
+            'interval': self.interval
+        }
@@ -0,0 +1,163 @@
+import argparse
+import os
+import sys
+import tempfile
+
+
+# Plan-regression check: drives every endpoint against a small seeded database
+# with the query profiler on and fails when a statement scans a whole table
+# that an index should serve. tests/test_query_plans.py runs it with pytest;
+# by hand:
+#
+#   python check_query_plans.py                          (temporary SQLite)
+#   python check_query_plans.py --database-url postgresql://.../scratch
+#
+# On PostgreSQL sequential scans are disabled for the check, since the planner
+# prefers them on tiny tables even when a usable index exists.
+
+# (route, table) pairs that are expected to scan; None is a background thread
+ALLOWED_SCANS = {
+    # GET /data walks the location table in primary key order, a page at a time
+    ('api.get_data', 'location'),
+    # Bulk loads run once per process by warm_up(): face embeddings, open
+    # attendance sessions and the legacy isAttendanceOpen flags
+    (None, 'student'),
+    (None, 'attendance_session'),
+    (None, 'course'),
+}
+
+# (method, path, json body, expected status)
+REQUESTS = [
+    ('POST', '/login', {'email': 'doctor@check', 'password': 'secret'}, 200),
+    ('POST', '/signup', {'name': 'New', 'email': 'new@check', 'password': 'x',
+                         'role': 'student', 'student_id': 'CHK9'}, 201),
+    ('POST', '/courses', {'name': 'Check 3', 'code': 'CHK3', 'description': 'd',
+                          'doctor_id': 1}, 201),
+    ('GET', '/courses/doctor/1', None, 200),
+    ('GET', '/courses/student/2', None, 200),
+    ('GET', '/courses/1/students', None, 200),
+    # Later pages (cursor 'MQ' resumes after id 1) with a field projection
+    ('GET', '/data?limit=1&cursor=MQ', None, 200),
+    ('GET', '/courses/doctor/1?limit=1&cursor=MQ&fields=id,name', None, 200),
+    ('GET', '/courses/student/2?limit=1&cursor=MQ', None, 200),
+    ('GET', '/courses/1/students?limit=1&cursor=MQ&fields=id,email', None, 200),
+    ('POST', '/courses/enroll', {'student_id': 4, 'enrollment_code': 'ECHK1'}, 201),
+    ('POST', '/courses/unenroll', {'student_id': 4, 'course_id': 1}, 200),
+    # A one-line NDJSON upload per identifier kind; emails match case-insensitively
+    ('POST', '/courses/1/enrollments/bulk?doctor_id=1&format=ndjson', {'email': 'S1@Check'}, 200),
+    ('POST', '/courses/1/enrollments/bulk?doctor_id=1&format=ndjson', {'id': '004'}, 200),
+    ('PUT', '/courses/1/geofence', {'doctor_id': 1, 'geofence': {
+        'type': 'circle', 'lat': 30.0, 'lon': 31.0, 'radius': 50}}, 200),
+    ('PUT', '/courses/1/attendance', {'isAttendanceOpen': True}, 200),
+    ('POST', '/attendance/verify-location', {'student_id': 2, 'course_id': 1,
+                                             'latitude': 30.0, 'longitude': 31.0}, 200),
+    ('POST', '/attendance/verify-location/batch', {'course_id': 1, 'records': [
+        {'student_id': 2, 'latitude': 30.0, 'longitude': 31.0},
+        {'student_id': 3, 'latitude': 30.0, 'longitude': 31.0}]}, 200),
+    ('POST', '/attendance/locate', {'student_id': 2, 'latitude': 30.0, 'longitude': 31.0}, 200),
+    ('GET', '/face/check-registration/2', None, 404),
+    ('GET', '/courses/1/attendance/export?doctor_id=1&from=2020-01-01', None, 200),
+    ('DELETE', '/courses/2', {'doctor_id': 1}, 200),
+]
+
+
+def seed(app_module):
+    db = app_module.db
+    User, Course, StudentCourse = app_module.User, app_module.Course, app_module.StudentCourse
+    db.session.add_all([
+        User(name='Doctor', email='doctor@check', password='secret', role='doctor', student_id='DCHK'),
+        User(name='Student 1', email='s1@check', password='x', role='student', student_id='CHK1'),
+        User(name='Student 2', email='s2@check', password='x', role='student', student_id='CHK2'),
+        User(name='Student 3', email='s3@check', password='x', role='student', student_id='CHK3'),
+    ])
+    db.session.commit()
+    db.session.add_all([
+        Course(name='Check 1', code='CHK1', doctor_id=1, enrollment_code='ECHK1', location='30.0,31.0'),
+        Course(name='Check 2', code='CHK2', doctor_id=1, enrollment_code='ECHK2', location='30.0,31.0'),
+    ])
+    db.session.commit()
+    db.session.add_all([
+        StudentCourse(student_id=2, course_id=1),
+        StudentCourse(student_id=3, course_id=1),
+        StudentCourse(student_id=2, course_id=2),
+    ])
+    db.session.commit()
+
+
+def engine_options(config):
+    """The application's engine options, with sequential scans off on PostgreSQL.
+
+    Set when connecting, so no connection the check's threads open runs without it.
+    """
+    import app as app_module
+
+    options = app_module.database_engine_options({**app_module.DEFAULT_CONFIG, **config})
+    if 'options' in options.get('connect_args', {}):
+        options['connect_args']['options'] += ' -c enable_seqscan=off'
+    return options
+
+
+def run(database_url):
+    import app as app_module
+
+    config = {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'QUERY_PROFILER': True,
+        'QUERY_PROFILER_THRESHOLD_MS': float('inf'),
+        'ENABLE_MIGRATIONS': False,
+        'WARM_UP': False,
+        'LOG_LEVEL': 'WARNING',
+        # One row per page so the export's keyset continuation query runs too
+        'ATTENDANCE_EXPORT_PAGE_SIZE': 1,
+    }
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config)
+    app = app_module.create_app(config)
+    with app.app_context():
+        app_module.db.create_all()
+        seed(app_module)
+
+    profiler = app_module.query_profiler
+    profiler.reset()
+    # Load the process-wide caches outside a request, as a worker does at start
+    app_module.warm_up()
+    client = app.test_client()
+    failures = []
+    for method, path, body, expected in REQUESTS:
+        response = client.open(path, method=method, json=body)
+        response.get_data()  # run streamed bodies to the end
+        if response.status_code != expected:
+            failures.append(f'{method} {path}: status {response.status_code}, expected {expected}')
+    app_module.location_writer.flush(timeout=10)
+    app_module.attendance_sessions.flush(timeout=10)
+
+    report = profiler.report(limit=10 ** 6)
+    print(f'{report["distinct_statements_seen"]} distinct statements checked')
+    for entry in report['statements']:
+        for table in entry['full_scan']:
+            for route in entry['routes']:
+                route = None if route == 'background' else route
+                if (route, table) in ALLOWED_SCANS:
+                    continue
+                failures.append(f'full scan of {table} from {route or "background"}:\n'
+                                f'    {entry["statement"]}\n    plan: {entry["plan"]}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fail when an endpoint query scans a whole table')
+    parser.add_argument('--database-url', help='scratch database (default: temporary SQLite); '
+                        'tables are created and rows inserted')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or 'sqlite:///' + os.path.join(tmp, 'plans.db')
+        failures = run(database_url)
+
+    for failure in failures:
+        print('FAIL', failure)
+    print('OK' if not failures else f'{len(failures)} problem(s)')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# MobileFaceNet output size used by the Flutter client (Recognizer.dart)
+EMBEDDING_DIM = 192
+
+# Binary embedding layout: version (u8), reserved (u8), dim (u16), then
+# dim little-endian float32 values. The 4-byte header keeps the payload aligned.
+EMBEDDING_FORMAT_VERSION = 1
+EMBEDDING_HEADER = struct.Struct('<BBH')
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+
+def encode_embedding(vector):
+    """Serialize an embedding to the versioned binary blob format."""
+    vector = np.asarray(vector, dtype=EMBEDDING_DTYPE).reshape(-1)
+    header = EMBEDDING_HEADER.pack(EMBEDDING_FORMAT_VERSION, 0, vector.shape[0])
+    return header + vector.tobytes()
+
+
+def decode_embedding(blob, dim=EMBEDDING_DIM):
+    """Return a read-only float32 view over a binary embedding blob (no copy)."""
+    if blob is None:
+        return None
+    if len(blob) < EMBEDDING_HEADER.size:
+        raise ValueError("Truncated embedding blob")
+    version, _, blob_dim = EMBEDDING_HEADER.unpack_from(blob)
+    if version != EMBEDDING_FORMAT_VERSION:
+        raise ValueError(f"Unsupported embedding format version {version}")
+    if blob_dim != dim:
+        raise ValueError(f"Expected {dim}-d embedding, got {blob_dim}")
+    if len(blob) != EMBEDDING_HEADER.size + dim * EMBEDDING_DTYPE.itemsize:
+        raise ValueError("Truncated embedding blob")
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE, count=dim,
+                         offset=EMBEDDING_HEADER.size)
+
+
+def parse_embedding(value, dim=EMBEDDING_DIM):
+    """Convert a stored embedding (blob or comma-joined floats) to a float32 vector."""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return decode_embedding(value, dim)
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        value = value.split(',')
+    vector = np.asarray(value, dtype=np.float32).reshape(-1)
+    if vector.shape[0] != dim:
+        raise ValueError(f"Expected {dim}-d embedding, got {vector.shape[0]}")
+    return vector
+
+
+class EmbeddingIndex:
+    """Exact 1:N matcher that keeps every embedding in one contiguous float32 matrix.
+
+    Rows are addressed by an integer key (``Student.id``). Inserts, updates and
+    deletes touch a single row, so changes made by this process never need a
+    rebuild; :meth:`reload` picks up those of other processes.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, capacity=1024):
+        self.dim = dim
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._keys = np.zeros(capacity, dtype=np.int64)
+        self._rows = {}
+        self._size = 0
+        # Incremented by every upsert and remove, see reload()
+        self.changes = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def keys(self):
+        with self._lock:
+            return self._keys[:self._size].copy()
+
+    @property
+    def nbytes(self):
+        return self._vectors.nbytes + self._sq_norms.nbytes + self._keys.nbytes
+
+    def _reserve(self, size):
+        capacity = self._vectors.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        keys = np.zeros(capacity, dtype=np.int64)
+        vectors[:self._size] = self._vectors[:self._size]
+        sq_norms[:self._size] = self._sq_norms[:self._size]
+        keys[:self._size] = self._keys[:self._size]
+        self._vectors, self._sq_norms, self._keys = vectors, sq_norms, keys
+
+    def load(self, items):
+        """Replace the whole index with ``(key, vector)`` pairs."""
+        latest = {}
+        for key, vector in items:
+            if vector is not None:
+                latest[int(key)] = vector
+        keys = list(latest)
+        with self._lock:
+            self._size = 0
+            self._reserve(max(len(keys), 1))
+            if keys:
+                matrix = np.asarray(list(latest.values()), dtype=np.float32)
+                matrix = matrix.reshape(len(keys), self.dim)
+                self._vectors[:len(keys)] = matrix
+                self._sq_norms[:len(keys)] = np.einsum('ij,ij->i', matrix, matrix)
+                self._keys[:len(keys)] = keys
+            self._rows = {key: row for row, key in enumerate(keys)}
+            self._size = len(keys)
+            self.loaded = True
+
+    def reload(self, read, attempts=3):
+        """Replace the contents with ``read()``, a ``(keys, vectors)`` pair.
+
+        An upsert or remove made while ``read`` runs may be missing from what
+        it returns, so in that case the rows are read again.
+        """
+        for attempt in range(attempts):
+            changes = self.changes
+            keys, vectors = read()
+            with self._lock:
+                if self.changes == changes or attempt == attempts - 1:
+                    self.load(zip(keys, vectors))
+                    return
+
+    def refresh(self, keys, read, attempts=3):
+        """Bring the rows of ``keys`` up to date with ``read(keys)``.
+
+        ``read`` returns ``(keys, vectors)`` for the keys that still have an
+        embedding; the others are removed. Retried like :meth:`reload`.
+        """
+        keys = [int(key) for key in keys]
+        for attempt in range(attempts):
+            changes = self.changes
+            found_keys, vectors = read(keys)
+            with self._lock:
+                if self.changes == changes or attempt == attempts - 1:
+                    found = dict(zip((int(key) for key in found_keys), vectors))
+                    for key in keys:
+                        self.upsert(key, found.get(key))
+                    return found
+
+    def upsert(self, key, vector):
+        key = int(key)
+        if vector is None:
+            self.remove(key)
+            return
+        vector = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self._reserve(self._size + 1)
+                row = self._size
+                self._size += 1
+                self._rows[key] = row
+                self._keys[row] = key
+            self._vectors[row] = vector
+            self._sq_norms[row] = float(vector @ vector)
+            self.changes += 1
+
+    def remove(self, key):
+        key = int(key)
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return False
+            self.changes += 1
+            last = self._size - 1
+            if row != last:
+                # Move the last row into the hole so the matrix stays contiguous
+                self._vectors[row] = self._vectors[last]
+                self._sq_norms[row] = self._sq_norms[last]
+                self._keys[row] = self._keys[last]
+                self._rows[int(self._keys[row])] = row
+            self._size = last
+            return True
+
+    def search(self, queries, k=1):
+        """Return ``(keys, distances)`` of the ``k`` nearest rows per query.
+
+        ``queries`` is a single vector or an ``(n, dim)`` batch; results are
+        always ``(n, k')`` arrays with ``k' = min(k, len(self))``, sorted by
+        ascending Euclidean distance.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        if queries.ndim != 2 or queries.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d query embeddings")
+        with self._lock:
+            size = self._size
+            k = min(int(k), size)
+            if k <= 0:
+                empty = np.zeros((queries.shape[0], 0))
+                return empty.astype(np.int64), empty.astype(np.float32)
+            # ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x, one GEMM for the whole batch
+            sq_dist = self._vectors[:size] @ queries.T
+            sq_dist *= -2.0
+            sq_dist += self._sq_norms[:size, np.newaxis]
+            sq_dist = sq_dist.T
+            sq_dist += np.einsum('ij,ij->i', queries, queries)[:, np.newaxis]
+            keys = self._keys[:size]
+            if k < size:
+                top = np.argpartition(sq_dist, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(size), (queries.shape[0], size))
+            top_dist = np.take_along_axis(sq_dist, top, axis=1)
+            order = np.argsort(top_dist, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_dist = np.take_along_axis(top_dist, order, axis=1)
+            result_keys = keys[top]
+        np.maximum(top_dist, 0, out=top_dist)
+        return result_keys, np.sqrt(top_dist)
+
+
+class CourseGallery:
+    """Embeddings of the students enrolled in one course, keyed by ``User.id``.
+
+    ``codes`` are the student codes of everyone enrolled, with or without an
+    embedding; a face registered by any of them makes the gallery stale.
+    """
+
+    def __init__(self, keys, vectors, labels, codes=None):
+        self.index = EmbeddingIndex(capacity=max(len(keys), 1))
+        self.index.load(zip(keys, vectors))
+        # User.id -> student code, so matches can be labelled without a query
+        self.labels = dict(labels)
+        self.codes = set(codes) if codes is not None else set(self.labels.values())
+
+    @property
+    def nbytes(self):
+        return self.index.nbytes
+
+
+class CourseGalleryCache:
+    """LRU of per-course galleries bounded by the bytes of their matrices."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Bumped by every invalidation so a load that raced with one is not cached
+        self._epoch = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def get(self, course_id, loader):
+        """Return the cached gallery for ``course_id``, building it with ``loader()``."""
+        with self._lock:
+            gallery = self._entries.get(course_id)
+            if gallery is not None:
+                self._entries.move_to_end(course_id)
+                self.hits += 1
+                return gallery
+            self.misses += 1
+            epoch = self._epoch
+
+        gallery = loader()
+
+        with self._lock:
+            if epoch == self._epoch and course_id not in self._entries:
+                self._entries[course_id] = gallery
+                self._bytes += gallery.nbytes
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted.nbytes
+        return gallery
+
+    def invalidate(self, course_id):
+        with self._lock:
+            self._epoch += 1
+            gallery = self._entries.pop(course_id, None)
+            if gallery is not None:
+                self._bytes -= gallery.nbytes
+
+    def invalidate_student(self, student_code):
+        """Drop every cached gallery that contains the given student code."""
+        with self._lock:
+            self._epoch += 1
+            stale = [course_id for course_id, gallery in self._entries.items()
+                     if student_code in gallery.codes]
+            for course_id in stale:
+                self._bytes -= self._entries.pop(course_id).nbytes
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,332 @@
+import json
+import threading
+
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371000
+DEFAULT_RADIUS_METERS = 30
+# A campus, not a city: larger circles are almost certainly a typo
+MAX_RADIUS_METERS = 2000
+
+# Metres per degree of latitude; longitude degrees shrink by cos(latitude)
+METERS_PER_DEGREE = np.pi * EARTH_RADIUS_METERS / 180.0
+
+
+class GeofenceError(ValueError):
+    pass
+
+
+def haversine_distances(lat1, lon1, lat2, lon2):
+    """Vectorized great-circle distance in metres between coordinate arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64))
+                              for v in (lat1, lon1, lat2, lon2))
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_METERS * c
+
+
+def parse_location(location):
+    """Parse the legacy ``"lat,lon"`` Course.location string."""
+    if not location or ',' not in location:
+        raise GeofenceError('Course location not set')
+    parts = location.split(',')
+    if len(parts) != 2:
+        raise GeofenceError('Invalid course location format')
+    try:
+        return float(parts[0].strip()), float(parts[1].strip())
+    except ValueError as e:
+        raise GeofenceError(f'Invalid course location format: {e}')
+
+
+def parse_coordinate(value, name):
+    """Return ``value`` as a float latitude or longitude; NaN and inf are out of range."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise GeofenceError(f'Invalid {name}: {value!r}')
+    limit = 90 if name == 'latitude' else 180
+    if not -limit <= value <= limit:
+        raise GeofenceError(f'{name} out of range: {value}')
+    return value
+
+
+class CircleFence:
+    """All points within ``radius`` metres of a centre."""
+
+    kind = 'circle'
+
+    def __init__(self, lat, lon, radius=DEFAULT_RADIUS_METERS, name=None):
+        self.lat = parse_coordinate(lat, 'latitude')
+        self.lon = parse_coordinate(lon, 'longitude')
+        self.radius = float(radius)
+        if not 0 < self.radius <= MAX_RADIUS_METERS:
+            raise GeofenceError(f'Geofence radius must be between 0 and {MAX_RADIUS_METERS} m')
+        self.name = name
+        dlat = self.radius / METERS_PER_DEGREE
+        dlon = dlat / max(np.cos(np.radians(self.lat)), 1e-6)
+        # (min_lat, min_lon, max_lat, max_lon)
+        self.bbox = (self.lat - dlat, self.lon - dlon, self.lat + dlat, self.lon + dlon)
+
+    def check_many(self, lats, lons):
+        # Distance to the centre keeps the numbers reported by verify_location
+        distances = haversine_distances(lats, lons, self.lat, self.lon)
+        return distances <= self.radius, distances
+
+    def to_spec(self):
+        spec = {'type': 'circle', 'lat': self.lat, 'lon': self.lon, 'radius': self.radius}
+        if self.name:
+            spec['name'] = self.name
+        return spec
+
+
+class PolygonFence:
+    """A simple polygon given as ``[[lat, lon], ...]``; distance is 0 inside."""
+
+    kind = 'polygon'
+
+    def __init__(self, points, margin=0.0, name=None):
+        if not isinstance(points, (list, tuple)) or len(points) < 3:
+            raise GeofenceError('Polygon geofence needs at least 3 points')
+        try:
+            coords = [(parse_coordinate(p[0], 'latitude'), parse_coordinate(p[1], 'longitude'))
+                      for p in points]
+        except (TypeError, IndexError, KeyError):
+            raise GeofenceError('Polygon points must be [lat, lon] pairs')
+        self.points = np.asarray(coords, dtype=np.float64)
+        self.margin = float(margin)
+        self.name = name
+        lats, lons = self.points[:, 0], self.points[:, 1]
+        # Local equirectangular projection in metres around the first vertex;
+        # accurate to well under a metre at classroom scale
+        self._origin = self.points[0]
+        self._lon_scale = METERS_PER_DEGREE * np.cos(np.radians(self._origin[0]))
+        xy = self._project(lats, lons)
+        self._x0, self._y0 = xy
+        self._x1, self._y1 = np.roll(xy[0], -1), np.roll(xy[1], -1)
+        pad_lat = self.margin / METERS_PER_DEGREE
+        pad_lon = self.margin / max(self._lon_scale, 1e-6)
+        self.bbox = (lats.min() - pad_lat, lons.min() - pad_lon,
+                     lats.max() + pad_lat, lons.max() + pad_lon)
+
+    def _project(self, lats, lons):
+        x = (np.asarray(lons, dtype=np.float64) - self._origin[1]) * self._lon_scale
+        y = (np.asarray(lats, dtype=np.float64) - self._origin[0]) * METERS_PER_DEGREE
+        return x, y
+
+    def check_many(self, lats, lons):
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        x, y = self._project(lats, lons)
+        px, py = x[:, np.newaxis], y[:, np.newaxis]
+
+        # Distance to the nearest edge (points x edges)
+        ex, ey = self._x1 - self._x0, self._y1 - self._y0
+        length_sq = np.where(ex * ex + ey * ey > 0, ex * ex + ey * ey, 1.0)
+        t = np.clip(((px - self._x0) * ex + (py - self._y0) * ey) / length_sq, 0.0, 1.0)
+        dx = px - (self._x0 + t * ex)
+        dy = py - (self._y0 + t * ey)
+        edge_distances = np.sqrt(dx * dx + dy * dy).min(axis=1)
+
+        # Ray casting, only for points inside the bounding box
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        candidates = (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+        inside = np.zeros(lats.shape[0], dtype=bool)
+        if candidates.any():
+            cx, cy = px[candidates], py[candidates]
+            crosses = (self._y0 > cy) != (self._y1 > cy)
+            dy_edge = np.where(self._y1 != self._y0, self._y1 - self._y0, 1.0)
+            x_cross = self._x0 + (cy - self._y0) * (self._x1 - self._x0) / dy_edge
+            inside[candidates] = (np.count_nonzero(crosses & (cx < x_cross), axis=1) % 2) == 1
+
+        distances = np.where(inside, 0.0, edge_distances)
+        return distances <= self.margin, distances
+
+    def to_spec(self):
+        spec = {'type': 'polygon', 'points': self.points.tolist()}
+        if self.margin:
+            spec['margin'] = self.margin
+        if self.name:
+            spec['name'] = self.name
+        return spec
+
+
+class MultiFence:
+    """Union of fences, e.g. every room a course may be held in."""
+
+    kind = 'rooms'
+
+    def __init__(self, parts):
+        if not parts:
+            raise GeofenceError('Rooms geofence needs at least one room')
+        self.parts = parts
+        boxes = np.asarray([part.bbox for part in parts])
+        self.bbox = (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+
+    def check_many(self, lats, lons):
+        results = [part.check_many(lats, lons) for part in self.parts]
+        inside = np.logical_or.reduce([r[0] for r in results])
+        distances = np.minimum.reduce([r[1] for r in results])
+        return inside, distances
+
+    def to_spec(self):
+        return {'type': 'rooms', 'rooms': [part.to_spec() for part in self.parts]}
+
+
+def check_point(fence, lat, lon):
+    inside, distances = fence.check_many([lat], [lon])
+    return bool(inside[0]), float(distances[0])
+
+
+def compile_geofence(spec, default_radius=DEFAULT_RADIUS_METERS):
+    """Build a fence object from its JSON-compatible spec (dict or JSON string)."""
+    if isinstance(spec, str):
+        try:
+            spec = json.loads(spec)
+        except ValueError as e:
+            raise GeofenceError(f'Invalid geofence JSON: {e}')
+    if not isinstance(spec, dict):
+        raise GeofenceError('Geofence must be an object')
+    kind = spec.get('type', 'circle')
+    name = spec.get('name')
+    if kind == 'circle':
+        return CircleFence(spec.get('lat'), spec.get('lon'),
+                           spec.get('radius', default_radius), name=name)
+    if kind == 'polygon':
+        return PolygonFence(spec.get('points'), spec.get('margin', 0.0), name=name)
+    if kind == 'rooms':
+        rooms = spec.get('rooms')
+        if not isinstance(rooms, list):
+            raise GeofenceError('Rooms geofence needs a list of rooms')
+        return MultiFence([compile_geofence(room, default_radius) for room in rooms])
+    raise GeofenceError(f'Unknown geofence type: {kind}')
+
+
+def compile_course_geofence(geofence, location, default_radius=DEFAULT_RADIUS_METERS):
+    """Compile a course's structured geofence, falling back to its location string."""
+    if geofence:
+        return compile_geofence(geofence, default_radius)
+    lat, lon = parse_location(location)
+    return CircleFence(lat, lon, default_radius)
+
+
+class GeofenceGrid:
+    """Uniform lat/lon grid mapping cells to the fences whose bounding box overlaps them.
+
+    A point lookup reads one cell, so finding the fences that may contain a
+    position does not depend on how many fences are registered. A fence
+    whose box would span more than ``max_cells`` cells (a huge polygon) is
+    kept in a short list checked on every lookup instead.
+    """
+
+    def __init__(self, cell_size=0.001, max_cells=4096):
+        # 0.001 degrees is about 111 m of latitude, a little larger than a lecture hall
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self._lock = threading.Lock()
+        self._cells = {}
+        self._fences = {}
+        self._large = {}
+
+    def __len__(self):
+        return len(self._fences)
+
+    def __contains__(self, key):
+        return key in self._fences
+
+    def _cell(self, lat, lon):
+        return int(np.floor(lat / self.cell_size)), int(np.floor(lon / self.cell_size))
+
+    def _cover(self, bbox):
+        """Cells overlapping ``bbox``, or None when there are more than max_cells."""
+        min_i, min_j = self._cell(bbox[0], bbox[1])
+        max_i, max_j = self._cell(bbox[2], bbox[3])
+        if (max_i - min_i + 1) * (max_j - min_j + 1) > self.max_cells:
+            return None
+        return [(i, j) for i in range(min_i, max_i + 1) for j in range(min_j, max_j + 1)]
+
+    def add(self, key, fence):
+        with self._lock:
+            self._remove(key)
+            cells = self._cover(fence.bbox)
+            if cells is None:
+                self._large[key] = fence
+                self._fences[key] = (fence, ())
+                return
+            for cell in cells:
+                self._cells.setdefault(cell, {})[key] = fence
+            self._fences[key] = (fence, cells)
+
+    def remove(self, key):
+        with self._lock:
+            return self._remove(key)
+
+    def _remove(self, key):
+        entry = self._fences.pop(key, None)
+        if entry is None:
+            return False
+        self._large.pop(key, None)
+        for cell in entry[1]:
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._cells[cell]
+        return True
+
+    def candidates(self, lat, lon):
+        """Return ``(key, fence)`` pairs whose bounding box may contain the point."""
+        bucket = self._cells.get(self._cell(lat, lon))
+        candidates = list(bucket.items()) if bucket else []
+        if self._large:
+            candidates.extend(self._large.items())
+        return candidates
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._fences.clear()
+            self._large.clear()
+
+
+class GeofenceCache:
+    """Compiled geofences keyed by course id.
+
+    The loader may return a fence, a GeofenceError (cached so bad locations
+    are not re-parsed on every request) or None for a missing course, which
+    is not cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._epoch = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, course_id, loader):
+        entry = self._entries.get(course_id)
+        if entry is not None:
+            return entry
+        with self._lock:
+            epoch = self._epoch
+        entry = loader()
+        if entry is not None:
+            with self._lock:
+                if epoch == self._epoch:
+                    self._entries[course_id] = entry
+        return entry
+
+    def invalidate(self, course_id):
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(course_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
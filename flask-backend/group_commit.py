@@ -0,0 +1,149 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    """Single writer thread that merges rows from many requests into one commit.
+
+    Callers ``submit`` rows and get a Future back. The writer takes the first
+    pending submission, keeps collecting until ``max_batch`` rows are queued or
+    ``max_delay`` seconds have passed, then calls ``flush(rows)`` once; a
+    single transaction (one fsync, one write lock) acknowledges the lot.
+    """
+
+    def __init__(self, flush, max_batch=256, max_delay=0.005, history=1024):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self._flush = flush
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._writer = None
+        # (rows, seconds) of the most recent flushes
+        self._history = deque(maxlen=history)
+        self._max_batch_seen = 0
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def submit(self, row):
+        return self.submit_many([row])
+
+    def submit_many(self, rows):
+        """Queue ``rows`` for the next group commit; the Future resolves to len(rows)."""
+        future = Future()
+        rows = list(rows)
+        if not rows:
+            future.set_result(0)
+            return future
+        self._queue.put((rows, future))
+        with self._lock:
+            self.submitted += len(rows)
+            # Started lazily so a forked worker gets its own writer thread
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._run, name='group-commit-writer', daemon=True
+                )
+                self._writer.start()
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        count = len(batch[0][0])
+        deadline = time.monotonic() + self.max_delay
+        while count < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            count += len(item[0])
+        return batch
+
+    def _write(self, batch):
+        rows = [row for rows, _ in batch for row in rows]
+        started = time.perf_counter()
+        self._flush(rows)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.batches += 1
+            self.written += len(rows)
+            self._max_batch_seen = max(self._max_batch_seen, len(rows))
+            self._history.append((len(rows), elapsed))
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._write(batch)
+                for rows, future in batch:
+                    future.set_result(len(rows))
+            except Exception as e:
+                self.failures += 1
+                if len(batch) == 1:
+                    logger.error("Group commit of %s rows failed: %s", len(batch[0][0]), e)
+                    batch[0][1].set_exception(e)
+                else:
+                    # Retry one submission at a time so a bad row only fails its own request
+                    logger.warning("Group commit of %s submissions failed, retrying individually: %s", len(batch), e)
+                    for item in batch:
+                        try:
+                            self._write([item])
+                            item[1].set_result(len(item[0]))
+                        except Exception as item_error:
+                            self.failures += 1
+                            item[1].set_exception(item_error)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """Block until every queued submission has been written (tests, shutdown)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def stats(self):
+        with self._lock:
+            history = list(self._history)
+            result = {
+                'pending': self.pending,
+                'submitted': self.submitted,
+                'written': self.written,
+                'batches': self.batches,
+                'failures': self.failures,
+                'max_batch': self.max_batch,
+                'max_delay_ms': self.max_delay * 1000,
+            }
+        if history:
+            sizes = np.array([h[0] for h in history])
+            latencies = np.array([h[1] for h in history]) * 1000
+            result['batch_size'] = {
+                'mean': float(sizes.mean()),
+                'max': self._max_batch_seen,
+            }
+            result['flush_ms'] = {
+                'mean': float(latencies.mean()),
+                'p50': float(np.percentile(latencies, 50)),
+                'p99': float(np.percentile(latencies, 99)),
+                'max': float(latencies.max()),
+            }
+        return result
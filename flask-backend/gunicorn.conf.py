@@ -0,0 +1,37 @@
+import multiprocessing
+import os
+
+# Pre-forking production server for wsgi:app; see README.md.
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# WEB_CONCURRENCY and THREADS set the worker processes and the threads per
+# worker. app.py disposes the database engines in every forked child, and its
+# atexit hook writes queued check-ins before a worker exits.
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 4))
+
+# Import the app once in the master so workers share its pages and start fast.
+# With preloading, SIGHUP restarts workers but keeps the old code; deploy new
+# code with SIGUSR2 (or run with PRELOAD_APP=0 and use SIGHUP).
+preload_app = os.environ.get('PRELOAD_APP', '1') == '1'
+
+# In-flight requests get this long to finish on reload/shutdown
+graceful_timeout = 30
+timeout = 60
+keepalive = 5
+
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = os.environ.get('ACCESS_LOG')  # e.g. '-' for stdout
+
+
+def post_worker_init(worker):
+    # The listening socket is already bound; load caches while requests are served
+    from app import start_warm_up
+    start_warm_up()
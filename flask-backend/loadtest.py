@@ -0,0 +1,156 @@
+import argparse
+import http.client
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+import numpy as np
+
+# HTTP load generator for the production server, see README.md.
+#
+#   python loadtest.py --url http://127.0.0.1:5000/courses/doctor/1
+#   python loadtest.py --sweep 1 2 4 8      (starts gunicorn per worker count)
+#
+# Clients run in separate processes so the generator is not limited by one GIL.
+
+
+def client(url, seconds, results):
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    deadline = time.monotonic() + seconds
+    latencies = []
+    errors = 0
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    results.put((latencies, errors))
+
+
+def run_load(url, seconds, clients):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client, args=(url, seconds, results))
+                 for _ in range(clients)]
+    for process in processes:
+        process.start()
+    latencies, errors = [], 0
+    for _ in processes:
+        batch, batch_errors = results.get()
+        latencies.extend(batch)
+        errors += batch_errors
+    for process in processes:
+        process.join()
+    ms = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'rps': len(latencies) / seconds,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'errors': errors,
+    }
+
+
+def wait_ready(base_url, timeout=30):
+    parts = urllib.parse.urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request('GET', '/ready')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def seed(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    script = (
+        "from app import create_app, db, User, Course\n"
+        "app = create_app()\n"
+        "with app.app_context():\n"
+        "    db.create_all()\n"
+        "    db.session.add(User(name='Load Test', email='load@test', password='x',"
+        " role='doctor', student_id='LOAD1'))\n"
+        "    db.session.commit()\n"
+        "    db.session.add_all(Course(name=f'Course {i}', code=f'LT{i}', doctor_id=1,"
+        " enrollment_code=f'E{i}', location='30.0,31.0') for i in range(20))\n"
+        "    db.session.commit()\n"
+    )
+    subprocess.run([sys.executable, '-c', script], env=env, check=True,
+                   cwd=os.path.dirname(os.path.abspath(__file__)),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def sweep(args):
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or 'sqlite:///' + os.path.join(tmp, 'loadtest.db')
+        seed(database_url)
+        print(f'{args.clients} clients, {args.seconds:.0f}s per run, GET {args.path}')
+        print(f'{"workers":>8} {"threads":>8} {"req/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        base = None
+        for workers in args.sweep:
+            env = dict(os.environ, DATABASE_URL=database_url, WEB_CONCURRENCY=str(workers),
+                       THREADS=str(args.threads), BIND=f'127.0.0.1:{args.port}')
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                base_url = f'http://127.0.0.1:{args.port}'
+                if not wait_ready(base_url):
+                    raise RuntimeError('server did not become ready')
+                run_load(base_url + args.path, 1, args.clients)  # warm-up
+                result = run_load(base_url + args.path, args.seconds, args.clients)
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+            base = base or result['rps']
+            print(f'{workers:>8} {args.threads:>8} {result["rps"]:>9.0f} {result["p50_ms"]:>8.1f} '
+                  f'{result["p99_ms"]:>8.1f} {result["errors"]:>7}   x{result["rps"] / base:.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the backend over HTTP')
+    parser.add_argument('--url', help='run against an already running server')
+    parser.add_argument('--sweep', type=int, nargs='+',
+                        help='start gunicorn with each of these worker counts')
+    parser.add_argument('--path', default='/courses/doctor/1')
+    parser.add_argument('--clients', type=int, default=2 * os.cpu_count())
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--database-url', help='database for --sweep (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    if args.sweep:
+        sweep(args)
+    elif args.url:
+        result = run_load(args.url, args.seconds, args.clients)
+        print(f'{result["rps"]:.0f} req/s, p50 {result["p50_ms"]:.1f} ms, '
+              f'p99 {result["p99_ms"]:.1f} ms, {result["errors"]} errors')
+    else:
+        parser.error('give --url or --sweep')
+
+
+if __name__ == '__main__':
+    main()
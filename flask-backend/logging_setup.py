@@ -0,0 +1,172 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+from flask import g, has_request_context, request
+
+# Keys whose values never reach a log line, wherever they appear in a payload
+SENSITIVE_KEYS = frozenset({
+    'password', 'new_password', 'old_password', 'token', 'access_token',
+    'authorization', 'secret', 'secret_key', 'embedding', 'embeddings',
+    'face_embedding',
+})
+REDACTED = '[redacted]'
+
+_listener = None
+_output = None
+
+
+def redact(value):
+    """Return a copy of ``value`` with sensitive dict entries masked."""
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in SENSITIVE_KEYS else redact(item)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(item) for item in value)
+    return value
+
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the route and drops debug records of unsampled requests.
+
+    Runs on the request thread, so it only reads attributes; formatting and
+    redaction happen on the listener thread.
+    """
+
+    def filter(self, record):
+        if not has_request_context():
+            record.route = None
+            return True
+        record.route = request.endpoint
+        if record.levelno <= logging.DEBUG:
+            return g.get('log_debug_sampled', True)
+        return True
+
+
+class RedactingFilter(logging.Filter):
+    """Masks sensitive fields in mapping/sequence arguments before formatting."""
+
+    def filter(self, record):
+        if isinstance(record.args, dict):
+            record.args = redact(record.args)
+        elif record.args:
+            record.args = tuple(redact(arg) for arg in record.args)
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats on the calling thread; keep msg/args as they
+    # are so the listener does the formatting. Arguments must not be mutated
+    # after the call (request payloads are not).
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        route = getattr(record, 'route', None)
+        if route:
+            entry['route'] = route
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+
+
+def configure_logging(level='INFO', fmt='text', stream=None):
+    """Route all logging through a queue drained by one listener thread.
+
+    Safe to call again: the level is updated and the pipeline reused.
+    """
+    global _listener, _output
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return _listener
+
+    _output = logging.StreamHandler(stream or sys.stderr)
+    if fmt == 'json':
+        _output.setFormatter(JsonFormatter())
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+        formatter.converter = time.gmtime
+        _output.setFormatter(formatter)
+    _output.addFilter(RedactingFilter())
+
+    queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RequestContextFilter())
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    _start_listener(queue_handler)
+    atexit.register(stop_logging)
+    return _listener
+
+
+def _queue_handler():
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DeferredQueueHandler):
+            return handler
+    return None
+
+
+def _start_listener(queue_handler):
+    global _listener
+    _listener = logging.handlers.QueueListener(queue_handler.queue, _output,
+                                               respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork; give the child its own queue
+    # and thread so records are not left in a queue nobody drains
+    queue_handler = _queue_handler()
+    if _listener is None or queue_handler is None:
+        return
+    queue_handler.queue = queue.SimpleQueue()
+    _start_listener(queue_handler)
+
+
+def stop_logging():
+    """Drain the queue and write any later records synchronously."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    queue_handler = _queue_handler()
+    root = logging.getLogger()
+    if queue_handler is not None:
+        root.removeHandler(queue_handler)
+        _output.filters[:0] = queue_handler.filters
+    root.addHandler(_output)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def sample_debug_logs(rates, default_rate=1.0):
+    """Decide once per request whether its debug records are kept.
+
+    ``rates`` maps endpoint names (e.g. ``'api.verify_location'``) to the
+    fraction of requests whose debug logs are emitted.
+    """
+    if not logging.getLogger().isEnabledFor(logging.DEBUG):
+        return
+    rate = rates.get(request.endpoint, default_rate)
+    g.log_debug_sampled = rate >= 1.0 or random.random() < rate
@@ -0,0 +1,188 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy import event
+
+# Histogram buckets: request latency (seconds), response size (bytes),
+# statements per request and database time per request (seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Route label for statements issued outside a request (writer and warm-up threads)
+BACKGROUND = 'background'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (non-cumulative, last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for label_values, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{_format_number(float(bound))}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {_format_number(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class RequestStats:
+    """Statements issued while serving one request."""
+
+    __slots__ = ('route', 'started', 'duration', 'queries', 'db_seconds', 'statements')
+
+    def __init__(self, route, keep_statements=0):
+        self.route = route
+        self.started = time.perf_counter()
+        self.duration = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        # (sql, seconds) of the first ``keep_statements`` statements, for the slow log
+        self.statements = [] if keep_statements else None
+
+
+class RequestMetrics:
+    """Per-route request latency, response size and database usage.
+
+    ``start_request``/``finish_request`` bracket a request on the serving
+    thread; engines passed to ``instrument_engine`` attribute their statements
+    to the request running on the same thread. ``render`` produces the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, keep_statements=50):
+        self.keep_statements = keep_statements
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'Time spent serving a request.',
+            ('route', 'method', 'status'), LATENCY_BUCKETS)
+        self.response_size = Histogram(
+            'http_response_size_bytes', 'Size of response bodies.',
+            ('route', 'method', 'status'), SIZE_BUCKETS)
+        self.request_queries = Histogram(
+            'http_request_db_queries', 'SQL statements executed per request.',
+            ('route',), QUERY_COUNT_BUCKETS)
+        self.request_db_time = Histogram(
+            'http_request_db_seconds', 'Time spent in the database per request.',
+            ('route',), LATENCY_BUCKETS)
+        self.queries_total = Counter(
+            'db_queries_total', 'SQL statements executed.', ('route',))
+        self.query_seconds_total = Counter(
+            'db_query_seconds_total', 'Time spent executing SQL statements.', ('route',))
+        self._local = threading.local()
+
+    @property
+    def families(self):
+        return (self.request_duration, self.response_size, self.request_queries,
+                self.request_db_time, self.queries_total, self.query_seconds_total)
+
+    def instrument_engine(self, engine):
+        if not event.contains(engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        stats = getattr(self._local, 'stats', None)
+        route = stats.route if stats is not None else BACKGROUND
+        self.queries_total.inc(1, route)
+        self.query_seconds_total.inc(elapsed, route)
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+            if stats.statements is not None and len(stats.statements) < self.keep_statements:
+                stats.statements.append((statement, elapsed))
+
+    def start_request(self, route, keep_statements=False):
+        self._local.stats = RequestStats(route, self.keep_statements if keep_statements else 0)
+        return self._local.stats
+
+    def finish_request(self, method, status, size):
+        """Record the current request and return its RequestStats (or None)."""
+        stats = getattr(self._local, 'stats', None)
+        if stats is None:
+            return None
+        self._local.stats = None
+        stats.duration = elapsed = time.perf_counter() - stats.started
+        status = str(status)
+        self.request_duration.observe(elapsed, stats.route, method, status)
+        if size is not None:
+            self.response_size.observe(size, stats.route, method, status)
+        self.request_queries.observe(stats.queries, stats.route)
+        self.request_db_time.observe(stats.db_seconds, stats.route)
+        return stats
+
+    def render(self):
+        lines = []
+        for family in self.families:
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,91 @@
+"""Store student embeddings as versioned float32 blobs
+
+Revision ID: 3f2a9c1d7b40
+Revises: 
+Create Date: 2026-10-18 10:12:31.204518
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+from face_index import encode_embedding, decode_embedding, parse_embedding
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Rows converted per SELECT/UPDATE round trip
+BATCH_SIZE = 1000
+
+student = sa.table(
+    'student',
+    sa.column('id', sa.Integer),
+    sa.column('embedding', sa.Text),
+    sa.column('embedding_bin', sa.LargeBinary),
+)
+
+
+def _convert_in_batches(bind, source, convert, target_values):
+    converted = skipped = 0
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(student.c.id, source)
+            .where(student.c.id > last_id, source.isnot(None))
+            .order_by(student.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        params = []
+        for row_id, value in rows:
+            try:
+                params.append({'row_id': row_id, 'value': convert(value)})
+            except ValueError as e:
+                logger.warning(f"Skipping embedding of student {row_id}: {e}")
+                skipped += 1
+        if params:
+            bind.execute(
+                student.update()
+                .where(student.c.id == sa.bindparam('row_id'))
+                .values(**target_values),
+                params
+            )
+        converted += len(params)
+        last_id = rows[-1][0]
+    logger.info(f"Converted {converted} embeddings ({skipped} skipped)")
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = {column['name'] for column in sa.inspect(bind).get_columns('student')}
+    if 'embedding_bin' not in columns:
+        with op.batch_alter_table('student', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('embedding_bin', sa.LargeBinary(), nullable=True))
+
+    _convert_in_batches(
+        bind,
+        student.c.embedding,
+        lambda text: encode_embedding(parse_embedding(text)),
+        {'embedding_bin': sa.bindparam('value'), 'embedding': None},
+    )
+
+
+def downgrade():
+    bind = op.get_bind()
+    _convert_in_batches(
+        bind,
+        student.c.embedding_bin,
+        lambda blob: ','.join(repr(float(x)) for x in decode_embedding(blob)),
+        {'embedding': sa.bindparam('value'), 'embedding_bin': None},
+    )
+
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.drop_column('embedding_bin')
@@ -0,0 +1,34 @@
+"""Denormalize enrollment count into course.students_count
+
+Revision ID: 5b7e13c9d2a1
+Revises: 8c41d0e2a9f3
+Create Date: 2026-10-18 14:48:52.011367
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e13c9d2a1'
+down_revision = '8c41d0e2a9f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('course')}
+    if 'students_count' not in columns:
+        with op.batch_alter_table('course', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('students_count', sa.Integer(), nullable=False,
+                                          server_default='0'))
+
+    op.execute(
+        'UPDATE course SET students_count = '
+        '(SELECT COUNT(*) FROM student_course WHERE student_course.course_id = course.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.drop_column('students_count')
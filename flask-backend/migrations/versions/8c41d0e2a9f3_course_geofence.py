@@ -0,0 +1,28 @@
+"""Add structured geofence to courses
+
+Revision ID: 8c41d0e2a9f3
+Revises: 3f2a9c1d7b40
+Create Date: 2026-10-18 14:21:07.559120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d0e2a9f3'
+down_revision = '3f2a9c1d7b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('course')}
+    if 'geofence' not in columns:
+        with op.batch_alter_table('course', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('geofence', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.drop_column('geofence')
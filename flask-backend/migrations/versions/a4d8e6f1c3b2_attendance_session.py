@@ -0,0 +1,39 @@
+"""Add attendance_session table
+
+Revision ID: a4d8e6f1c3b2
+Revises: 5b7e13c9d2a1
+Create Date: 2026-10-18 15:20:44.870231
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8e6f1c3b2'
+down_revision = '5b7e13c9d2a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('attendance_session'):
+        return
+    op.create_table('attendance_session',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('opened_at', sa.DateTime(), nullable=False),
+    sa.Column('closed_at', sa.DateTime(), nullable=True),
+    sa.Column('radius', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('attendance_session', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_attendance_session_course_id'), ['course_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('attendance_session', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_attendance_session_course_id'))
+
+    op.drop_table('attendance_session')
@@ -0,0 +1,30 @@
+"""Add a lower(email) index for case-insensitive user lookups
+
+Revision ID: b1d6e4a9c2f7
+Revises: f3b9d1c6a8e4
+Create Date: 2026-10-18 21:40:37.215804
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1d6e4a9c2f7'
+down_revision = 'f3b9d1c6a8e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Expression indexes are not reflected on SQLite, hence IF NOT EXISTS
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')],
+                            postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user', if_exists=True)
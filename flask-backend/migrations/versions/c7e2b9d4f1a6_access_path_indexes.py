@@ -0,0 +1,49 @@
+"""Add indexes for attendance, enrollment and role-check access paths
+
+Revision ID: c7e2b9d4f1a6
+Revises: a4d8e6f1c3b2
+Create Date: 2026-10-18 16:05:12.448913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2b9d4f1a6'
+down_revision = 'a4d8e6f1c3b2'
+branch_labels = None
+depends_on = None
+
+# (table, index name, columns); keep in sync with the models in app.py
+INDEXES = [
+    ('student_location', 'ix_student_location_course_id_timestamp', ['course_id', 'timestamp', 'id']),
+    ('student_location', 'ix_student_location_student_id_course_id', ['student_id', 'course_id']),
+    ('student_course', 'ix_student_course_course_id_student_id', ['course_id', 'student_id']),
+    ('user', 'ix_user_id_role', ['id', 'role']),
+    ('course', 'ix_course_doctor_id', ['doctor_id']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    for table, name, columns in INDEXES:
+        if name in _existing_indexes(table):
+            continue
+        if postgresql:
+            # Build without blocking writes to large tables; CONCURRENTLY cannot
+            # run inside the migration transaction
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+        else:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for table, name, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,69 @@
+"""Widen user.password and hash stored plaintext passwords
+
+Revision ID: e5a1c8f3b7d2
+Revises: c7e2b9d4f1a6
+Create Date: 2026-10-18 17:41:08.302715
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+from passwords import DEFAULT_METHOD, PasswordHasher, is_password_hash
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1c8f3b7d2'
+down_revision = 'c7e2b9d4f1a6'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Rows hashed per SELECT/UPDATE round trip
+BATCH_SIZE = 1000
+
+user = sa.table(
+    'user',
+    sa.column('id', sa.Integer),
+    sa.column('password', sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password', existing_type=sa.String(length=100),
+                              type_=sa.String(length=255), existing_nullable=False)
+
+    bind = op.get_bind()
+    hashed = 0
+    last_id = 0
+    with PasswordHasher(DEFAULT_METHOD) as hasher:
+        while True:
+            rows = bind.execute(
+                sa.select(user.c.id, user.c.password)
+                .where(user.c.id > last_id)
+                .order_by(user.c.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            plain = [row for row in rows if not is_password_hash(row.password)]
+            if not plain:
+                continue
+            hashes = hasher.collect(hasher.submit([row.password for row in plain]))
+            bind.execute(
+                user.update().where(user.c.id == sa.bindparam('row_id'))
+                .values(password=sa.bindparam('hashed')),
+                [{'row_id': row.id, 'hashed': value} for row, value in zip(plain, hashes)]
+            )
+            hashed += len(plain)
+    logger.info("Hashed %s plaintext passwords", hashed)
+
+
+def downgrade():
+    # Hashes cannot be turned back into plaintext and do not fit in 100
+    # characters, so the column keeps its width
+    pass
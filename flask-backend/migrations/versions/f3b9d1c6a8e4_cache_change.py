@@ -0,0 +1,39 @@
+"""Add cache_change table
+
+Revision ID: f3b9d1c6a8e4
+Revises: e5a1c8f3b7d2
+Create Date: 2026-10-18 19:05:12.418903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d1c6a8e4'
+down_revision = 'e5a1c8f3b7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('cache_change'):
+        return
+    op.create_table('cache_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('key', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    # Ids must never be reused once rows are pruned
+    sqlite_autoincrement=True
+    )
+    with op.batch_alter_table('cache_change', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_cache_change_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cache_change', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_cache_change_created_at'))
+
+    op.drop_table('cache_change')
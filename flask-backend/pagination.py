@@ -0,0 +1,135 @@
+import base64
+import json
+from collections import namedtuple
+
+from sqlalchemy import Boolean, Integer, String, select
+
+from serializers import compile_serializer
+
+Page = namedtuple('Page', 'limit after fields columns')
+PageResult = namedtuple('PageResult', 'items keys next_cursor')
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(key):
+    """Opaque token for the last key of a page."""
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(key, int) or isinstance(key, bool):
+        raise PaginationError('Invalid cursor')
+    return key
+
+
+class Field:
+    """One output field: the columns it reads and how to build its value from them."""
+
+    __slots__ = ('columns', 'value')
+
+    def __init__(self, *columns, value=None):
+        self.columns = columns
+        self.value = value
+
+
+class ListResource:
+    """Keyset-paginated listing of rows with an optional field projection.
+
+    ``key`` is the integer column pages are ordered and resumed by;
+    ``fields`` maps output names to :class:`Field` and defines the default
+    (full) representation. Rows are read as plain tuples with only the
+    columns the requested fields need, and turned into dicts by a serializer
+    compiled once per projection.
+    """
+
+    def __init__(self, key, fields):
+        self.key = key
+        self.fields = fields
+        self._serializers = {}
+        # Every field is read from integer, string or boolean columns, so items
+        # can go through serializers.dumps (value functions must keep to that)
+        self.json_native = all(isinstance(column.type, (Integer, String, Boolean))
+                               for field in fields.values() for column in field.columns)
+
+    def parse(self, args, default_limit, max_limit):
+        """Read ``limit``, ``cursor`` and ``fields`` from request args into a Page.
+
+        With neither ``limit`` nor ``default_limit`` the page is unbounded:
+        every row, and no ``next_cursor``.
+        """
+        limit = args.get('limit', default_limit)
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                raise PaginationError('limit must be an integer')
+            if not 1 <= limit <= max_limit:
+                raise PaginationError(f'limit must be between 1 and {max_limit}')
+        cursor = args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+        fields = [name.strip() for name in args.get('fields', '').split(',') if name.strip()]
+        if fields:
+            unknown = [name for name in fields if name not in self.fields]
+            if unknown:
+                raise PaginationError(f'Unknown fields: {", ".join(unknown)} '
+                                      f'(available: {", ".join(self.fields)})')
+        else:
+            fields = list(self.fields)
+        columns = [self.key]
+        for name in fields:
+            for column in self.fields[name].columns:
+                if not any(column is seen for seen in columns):
+                    columns.append(column)
+        return Page(limit, after, fields, columns)
+
+    def select(self, page):
+        """SELECT of the key and the columns the page's fields need, resuming after the cursor.
+
+        Callers add their joins and filters to the returned statement.
+        """
+        query = select(*page.columns).order_by(self.key)
+        if page.limit is not None:
+            query = query.limit(page.limit + 1)
+        if page.after is not None:
+            query = query.where(self.key > page.after)
+        return query
+
+    def fetch(self, session, query, page):
+        """Run ``query`` (from :meth:`select`) and build the page's items."""
+        rows = session.execute(query).all()
+        next_cursor = None
+        if page.limit is not None and len(rows) > page.limit:
+            rows = rows[:page.limit]
+            next_cursor = encode_cursor(rows[-1][0])
+        serialize = self.serializer(page)
+        return PageResult([serialize(row) for row in rows], [row[0] for row in rows], next_cursor)
+
+    def first(self, session, *criteria):
+        """Full representation of the first row matching ``criteria``, or None."""
+        page = self.parse({}, 1, 1)
+        row = session.execute(select(*page.columns).where(*criteria).limit(1)).first()
+        return self.serializer(page)(row) if row is not None else None
+
+    def serializer(self, page):
+        serialize = self._serializers.get(tuple(page.fields))
+        if serialize is None:
+            fields = []
+            for name in page.fields:
+                field = self.fields[name]
+                indexes = [next(index for index, column in enumerate(page.columns) if column is wanted)
+                           for wanted in field.columns]
+                fields.append((name, indexes, field.value))
+            serialize = compile_serializer(fields)
+            # Bounded by the number of distinct projections clients ask for
+            if len(self._serializers) < 256:
+                self._serializers[tuple(page.fields)] = serialize
+        return serialize
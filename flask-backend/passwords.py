@@ -0,0 +1,93 @@
+import hmac
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# scrypt with N=2**15, r=8, p=1: ~100 ms and 32 MiB per hash. hashlib releases
+# the GIL while it runs, so other request threads keep going during a login.
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def is_password_hash(value):
+    return bool(value) and value.startswith(HASH_PREFIXES) and value.count('$') == 2
+
+
+def hash_password(password, method=DEFAULT_METHOD):
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(stored, password, method=DEFAULT_METHOD):
+    """Check ``password`` against a stored value; returns ``(ok, needs_rehash)``.
+
+    Rows written before hashing was introduced hold the plaintext; they still
+    verify and are reported for rehashing, as are hashes of another method.
+    """
+    if not stored or not isinstance(password, str):
+        return False, False
+    if not is_password_hash(stored):
+        return hmac.compare_digest(stored.encode(), password.encode()), True
+    ok = check_password_hash(stored, password)
+    return ok, ok and not stored.startswith(method + '$')
+
+
+# Compared against when the account does not exist, so an unknown email costs
+# the same time as a wrong password
+_DUMMY_HASH = None
+
+
+def burn_verification(method=DEFAULT_METHOD):
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password(os.urandom(16).hex(), method)
+    check_password_hash(_DUMMY_HASH, '')
+
+
+def _hash_many(passwords, method):
+    return [hash_password(password, method) for password in passwords]
+
+
+class PasswordHasher:
+    """Hashes batches of passwords on a process pool sized to the usable cores.
+
+    Workers are started with ``spawn`` so they never inherit the server's
+    threads or open database connections.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=None):
+        self.method = method
+        self.workers = workers or available_cores()
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown()
+        self._executor = None
+
+    def submit(self, passwords):
+        """Start hashing ``passwords``; returns a list of Futures of hash lists, in order."""
+        passwords = list(passwords)
+        size = max(1, -(-len(passwords) // self.workers))
+        return [self._executor.submit(_hash_many, passwords[start:start + size], self.method)
+                for start in range(0, len(passwords), size)]
+
+    @staticmethod
+    def collect(futures):
+        hashes = []
+        for future in futures:
+            hashes.extend(future.result())
+        return hashes
@@ -0,0 +1,174 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*(?:\?|%s|\$\d+|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|\$\d+|%\(\w+\)s))+\s*\)')
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+# SQLite: "SCAN location" (a covering-index scan says "USING ... INDEX");
+# PostgreSQL: "Seq Scan on location"
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(?!CONSTANT ROW)(\w+)(?!.*USING)')
+_POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def normalize_statement(statement):
+    """Collapse literals, IN-lists and whitespace so variants of one query group together."""
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    return _IN_LIST.sub('(...)', statement)
+
+
+def bind_shape(parameters, executemany=False):
+    """Describe bound parameters by type only; values are never kept."""
+    if executemany:
+        rows = len(parameters)
+        return f'{rows} x {bind_shape(parameters[0]) if rows else "()"}'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}'
+                               for key, value in parameters.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters or ()) + ')'
+
+
+def full_scans(dialect, plan):
+    pattern = _POSTGRES_SCAN if dialect == 'postgresql' else _SQLITE_SCAN
+    tables = []
+    for line in plan:
+        match = pattern.search(line)
+        if match:
+            tables.append(match.group(1))
+    return tables
+
+
+class QueryProfiler:
+    """Records slow statements and statements that scan whole tables.
+
+    Engines passed to ``instrument_engine`` are timed per cursor execution.
+    Each distinct normalized statement is explained once (``EXPLAIN QUERY
+    PLAN`` on SQLite, ``EXPLAIN`` on PostgreSQL); executions slower than
+    ``threshold_ms`` or whose plan contains a full table scan are kept for
+    ``window`` seconds and aggregated by :meth:`report`.
+    """
+
+    def __init__(self, threshold_ms=50, window=300, max_records=10000, route_of=None):
+        self.threshold_ms = threshold_ms
+        self.window = window
+        self._route_of = route_of or (lambda: None)
+        self._lock = threading.Lock()
+        # (time, key, milliseconds, route, bind shape)
+        self._records = deque(maxlen=max_records)
+        # normalized statement -> (sql, plan lines, full-scan tables)
+        self._plans = {}
+
+    def instrument_engine(self, engine):
+        if not event.contains(engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._profiler_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_profiler_started', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        key = normalize_statement(statement)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._explain(conn, statement, parameters, executemany)
+            with self._lock:
+                self._plans[key] = plan
+        if elapsed_ms < self.threshold_ms and not plan[2]:
+            return
+        record = (time.time(), key, elapsed_ms, self._route_of(), bind_shape(parameters, executemany))
+        with self._lock:
+            self._records.append(record)
+
+    def _explain(self, conn, statement, parameters, executemany):
+        if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return statement, [], []
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        dialect = conn.dialect.name
+        # A separate DBAPI cursor leaves the caller's result set untouched
+        cursor = conn.connection.cursor()
+        try:
+            if dialect == 'postgresql':
+                # A failed EXPLAIN must not abort the caller's transaction
+                cursor.execute('SAVEPOINT query_profiler')
+                try:
+                    cursor.execute('EXPLAIN ' + statement, parameters)
+                    plan = [row[0] for row in cursor.fetchall()]
+                finally:
+                    cursor.execute('ROLLBACK TO SAVEPOINT query_profiler')
+            elif dialect == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+                plan = [row[-1] for row in cursor.fetchall()]
+            else:
+                return statement, [], []
+        except Exception as e:
+            logger.warning("Could not explain statement: %s", e)
+            return statement, [], []
+        finally:
+            cursor.close()
+        return statement, plan, full_scans(dialect, plan)
+
+    def _trim(self, now):
+        horizon = now - self.window
+        while self._records and self._records[0][0] < horizon:
+            self._records.popleft()
+
+    def report(self, limit=50, sort='total_ms'):
+        """Aggregate the records of the last ``window`` seconds by statement."""
+        now = time.time()
+        with self._lock:
+            self._trim(now)
+            records = list(self._records)
+            plans = dict(self._plans)
+
+        grouped = {}
+        for recorded_at, key, elapsed_ms, route, shape in records:
+            grouped.setdefault(key, []).append((recorded_at, elapsed_ms, route, shape))
+
+        statements = []
+        for key, rows in grouped.items():
+            sql, plan, scans = plans.get(key, (key, [], []))
+            durations = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+            statements.append({
+                'statement': key,
+                'sql': sql,
+                'count': len(rows),
+                'total_ms': round(float(durations.sum()), 3),
+                'mean_ms': round(float(durations.mean()), 3),
+                'p95_ms': round(float(np.percentile(durations, 95)), 3),
+                'max_ms': round(float(durations.max()), 3),
+                'routes': dict(Counter(row[2] or 'background' for row in rows)),
+                'bind_shapes': sorted({row[3] for row in rows}),
+                'full_scan': scans,
+                'plan': plan,
+                'last_seen': max(row[0] for row in rows),
+            })
+        statements.sort(key=lambda entry: entry.get(sort, entry['total_ms']), reverse=True)
+        return {
+            'window_seconds': self.window,
+            'threshold_ms': self.threshold_ms,
+            'distinct_statements_seen': len(plans),
+            'recorded': len(records),
+            'statements': statements[:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+            self._plans.clear()
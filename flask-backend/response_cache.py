@@ -0,0 +1,86 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Bounded LRU of serialized GET responses validated by tag versions.
+
+    Every entry records the version of each tag it depends on (for example
+    ``('course', 3)``); bumping a tag with :meth:`invalidate` makes all entries
+    that saw the old version stale. ETags are a digest of the body, so they
+    agree between worker processes and never produce a false 304.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._versions = {}
+        # Bumped by every invalidation; a response built across one is not stored
+        self._epoch = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def epoch(self):
+        return self._epoch
+
+    def lookup(self, key):
+        """Return ``(etag, body)`` for a fresh entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                tag_versions, etag, body = entry
+                if all(self._versions.get(tag, 0) == version for tag, version in tag_versions):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return etag, body
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def store(self, key, tags, body, epoch):
+        """Cache ``body`` under ``key`` unless an invalidation happened since ``epoch``."""
+        etag = make_etag(body)
+        with self._lock:
+            if epoch != self._epoch:
+                return etag
+            tag_versions = tuple((tag, self._versions.get(tag, 0)) for tag in set(tags))
+            self._entries[key] = (tag_versions, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return etag
+
+    def invalidate(self, *tags):
+        with self._lock:
+            self._epoch += 1
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'evictions': self.evictions,
+        }
+
+
+def make_etag(body):
+    # Unquoted; Response.set_etag adds the quotes
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
@@ -0,0 +1,52 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+
+def dumps_stdlib(obj):
+    """The body ``jsonify(obj)`` writes outside debug mode: compact, sorted keys, ASCII only."""
+    return (json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(',', ':')) + '\n').encode()
+
+
+def dumps(obj):
+    """Same bytes as :func:`dumps_stdlib`, encoded with orjson when it is installed.
+
+    Only for payloads of str, int, bool, None, lists and dicts: orjson writes
+    some floats differently (``1e16`` for ``1e+16``) and handles dates itself.
+    orjson has no ``ensure_ascii``; a body holding non-ASCII text (or DEL) is
+    encoded again by the stdlib, whose C escaping beats re-escaping in Python.
+    """
+    if orjson is not None:
+        try:
+            body = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits or non-string keys
+            return dumps_stdlib(obj)
+        if body.isascii() and b'\x7f' not in body:
+            return body
+    return dumps_stdlib(obj)
+
+
+def compile_serializer(fields):
+    """Build a function turning one row tuple into a dict.
+
+    ``fields`` is a sequence of ``(name, indexes, value)``: the value of
+    ``name`` is ``row[indexes[0]]``, or ``value(*(row[i] for i in indexes))``
+    when ``value`` is given. The dict is written out as one literal, so a row
+    costs a single call with no per-field loop.
+    """
+    namespace = {}
+    items = []
+    for position, (name, indexes, value) in enumerate(fields):
+        arguments = ', '.join(f'row[{index}]' for index in indexes)
+        if value is None:
+            items.append(f'{name!r}: {arguments}')
+        else:
+            namespace[f'value_{position}'] = value
+            items.append(f'{name!r}: value_{position}({arguments})')
+    source = 'def serialize(row):\n    return {%s}\n' % ', '.join(items)
+    exec(compile(source, '<serializer>', 'exec'), namespace)
+    return namespace['serialize']
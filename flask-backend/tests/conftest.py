@@ -0,0 +1,68 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine
+
+
+def reset_process_state():
+    """Forget what the process-wide caches hold about the previous test database.
+
+    app.py keeps its caches per process and serves the last application
+    created, so every module that creates one starts from here.
+    """
+    import app as app_module
+
+    app_module.location_writer.flush(timeout=10)
+    app_module.attendance_sessions.flush(timeout=10)
+    app_module.attendance_sessions.invalidate()
+    app_module.face_index.loaded = False
+    app_module.reset_open_course_grid()
+    for cache in (app_module.geofences, app_module.course_galleries, app_module.response_cache,
+                  app_module.principals, app_module.verified_tokens):
+        cache.clear()
+    app_module.cache_changes.reset()
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    """Application on a fresh SQLite database, shared by the tests of one module."""
+    import app as app_module
+
+    reset_process_state()
+    path = tmp_path_factory.mktemp('db') / 'test.db'
+    application = app_module.create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'TESTING': True,
+        'WARM_UP': False,
+        'ENABLE_MIGRATIONS': False,
+        'LOG_LEVEL': 'WARNING',
+    })
+    with application.app_context():
+        app_module.db.create_all()
+    yield application
+    reset_process_state()
+    app_module.dispose_engines()
+
+
+@pytest.fixture
+def fresh_process():
+    """For tests that create their own application (see reset_process_state)."""
+    reset_process_state()
+    yield
+    reset_process_state()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def postgres_engine():
+    """Engine on the scratch PostgreSQL database in TEST_DATABASE_URL; skips without one."""
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    engine = create_engine(url)
+    yield engine
+    engine.dispose()
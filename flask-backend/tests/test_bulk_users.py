@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, select
+from sqlalchemy.exc import IntegrityError
+
+import bulk_users
+from bulk_copy import copy_rows
+from bulk_users import CREATED, EXISTS, UserProvisioner
+from passwords import PasswordHasher
+
+
+@pytest.fixture
+def user_table(postgres_engine):
+    metadata = MetaData()
+    table = Table(
+        'provision_check', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('email', String(120), unique=True, nullable=False),
+        Column('password', String(255), nullable=False),
+        Column('student_id', String(50), unique=True, nullable=False),
+        Column('name', String(100), nullable=False),
+        Column('role', String(20), nullable=False),
+    )
+    metadata.drop_all(postgres_engine)
+    metadata.create_all(postgres_engine)
+    yield table
+    metadata.drop_all(postgres_engine)
+
+
+def _user(number):
+    return {'email': f'user{number}@check', 'password': 'x', 'student_id': f'S{number}',
+            'name': f'User {number}', 'role': 'student'}
+
+
+def test_copy_duplicate_raises_integrity_error(postgres_engine, user_table):
+    with postgres_engine.begin() as connection:
+        copy_rows(connection, user_table, [_user(1)])
+    with pytest.raises(IntegrityError):
+        with postgres_engine.begin() as connection:
+            copy_rows(connection, user_table, [_user(2), _user(1)])
+
+
+def test_conflicting_batch_is_inserted_row_by_row(postgres_engine, user_table, monkeypatch):
+    with postgres_engine.begin() as connection:
+        connection.execute(user_table.insert(), _user(2))
+    # As if user 2 registered between the existence check and the COPY
+    monkeypatch.setattr(bulk_users, '_existing', lambda *args: set())
+
+    with PasswordHasher('pbkdf2:sha256:1', workers=1) as hasher:
+        provisioner = UserProvisioner(postgres_engine, user_table, hasher)
+        summary = provisioner.run(enumerate([_user(1), _user(2), _user(3)], start=1))
+
+    assert [entry['status'] for entry in provisioner.report] == [CREATED, EXISTS, CREATED]
+    assert summary['created'] == 2
+    with postgres_engine.connect() as connection:
+        emails = set(connection.execute(select(user_table.c.email)).scalars())
+    assert emails == {'user1@check', 'user2@check', 'user3@check'}
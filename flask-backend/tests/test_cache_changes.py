@@ -0,0 +1,201 @@
+import datetime
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, func, select
+
+from cache_changes import ChangeWatch
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "changes.db"}')
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def watch(engine):
+    metadata = MetaData()
+    table = Table(
+        'cache_change', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(50), nullable=False),
+        Column('key', Integer, nullable=True),
+        Column('created_at', DateTime, nullable=False),
+        sqlite_autoincrement=True,
+    )
+    metadata.create_all(engine)
+    return ChangeWatch(table, gap_timeout=60)
+
+
+def _handled(watch, name):
+    calls = []
+    watch.on_change(name, calls.append)
+    return calls
+
+
+def _record(engine, watch, name, key=None, row_id=None):
+    """Record a change as another process would: committed, but not reported to ``watch``."""
+    with engine.begin() as connection:
+        if row_id is None:
+            return watch.record(connection, name, key)
+        connection.execute(watch.table.insert().values(
+            id=row_id, name=name, key=key, created_at=datetime.datetime.utcnow()
+        ))
+        return row_id
+
+
+def test_first_poll_only_records_the_position(engine, watch):
+    courses = _handled(watch, 'courses')
+    _record(engine, watch, 'courses', 1)
+    assert watch.poll(engine) == []
+    assert courses == []
+    assert watch.last_id == 1
+
+
+def test_keys_of_other_processes_are_passed_per_name(engine, watch):
+    courses = _handled(watch, 'courses')
+    users = _handled(watch, 'users')
+    watch.poll(engine)
+    for name, key in [('courses', 3), ('courses', 4), ('courses', 3), ('users', None), ('other', 1)]:
+        _record(engine, watch, name, key)
+
+    assert sorted(watch.poll(engine)) == ['courses', 'users']
+    assert courses == [{3, 4}]
+    assert users == [{None}]
+    assert watch.poll(engine) == []
+
+
+def test_own_committed_changes_are_skipped(engine, watch):
+    courses = _handled(watch, 'courses')
+    watch.poll(engine)
+    own = _record(engine, watch, 'courses', 1)
+    watch.committed([own])
+    _record(engine, watch, 'courses', 2)
+
+    watch.poll(engine)
+    assert courses == [{2}]
+
+
+def test_late_commits_are_read_from_gaps(engine, watch):
+    courses = _handled(watch, 'courses')
+    watch.poll(engine)
+    # Id 1 was taken by a transaction that commits after id 2
+    _record(engine, watch, 'courses', 2, row_id=2)
+    watch.poll(engine)
+    assert watch.stats()['gaps'] == 1
+
+    _record(engine, watch, 'courses', 1, row_id=1)
+    watch.poll(engine)
+    assert courses == [{2}, {1}]
+    assert watch.stats()['gaps'] == 0
+
+
+def test_gaps_are_given_up_after_the_timeout(engine, watch):
+    watch.gap_timeout = 0
+    watch.poll(engine)
+    _record(engine, watch, 'courses', 2, row_id=2)
+    watch.poll(engine)
+    watch.poll(engine)
+    assert watch.stats()['gaps'] == 0
+
+
+def test_a_failing_handler_does_not_stop_the_others(engine, watch):
+    def broken(keys):
+        raise RuntimeError('boom')
+
+    watch.on_change('courses', broken)
+    courses = _handled(watch, 'courses')
+    watch.poll(engine)
+    _record(engine, watch, 'courses', 1)
+    watch.poll(engine)
+    assert courses == [{1}]
+
+
+def test_reset_forgets_own_ids(engine, watch):
+    courses = _handled(watch, 'courses')
+    watch.poll(engine)
+    watch.committed([1])
+    watch.reset()
+    watch.poll(engine)
+    _record(engine, watch, 'courses', 1)
+
+    watch.poll(engine)
+    assert courses == [{1}]
+
+
+def test_prune_deletes_rows_older_than_the_retention(engine, watch):
+    old = datetime.datetime.utcnow() - datetime.timedelta(hours=2)
+    with engine.begin() as connection:
+        connection.execute(watch.table.insert().values(name='courses', key=1, created_at=old))
+    _record(engine, watch, 'courses', 2)
+    watch.retention = 3600
+
+    assert watch.prune(engine) == 1
+    with engine.connect() as connection:
+        assert connection.execute(select(func.count()).select_from(watch.table)).scalar() == 1
+
+
+def test_writes_record_the_rows_they_touched(app):
+    from app import CacheChange, Course, User, db
+
+    with app.app_context():
+        doctor = User(name='Doctor', email='doctor@cc', password='x', role='doctor', student_id='DCC')
+        db.session.add(doctor)
+        db.session.commit()
+        start = db.session.query(func.max(CacheChange.id)).scalar() or 0
+        course = Course(name='CC', code='CC1', doctor_id=doctor.id, enrollment_code='ECC1')
+        db.session.add(course)
+        db.session.commit()
+        course_id = course.id
+        course.name = 'Renamed'
+        course.description = 'Changed twice in one transaction'
+        db.session.commit()
+        changes = db.session.query(CacheChange.name, CacheChange.key).filter(
+            CacheChange.id > start
+        ).order_by(CacheChange.id).all()
+    # One row per (name, key) and transaction
+    assert changes == [('courses', course_id), ('courses', course_id)]
+
+
+def test_face_changes_of_other_processes_refresh_only_their_rows(app):
+    import app as app_module
+    from app import Student, db
+    from face_index import EMBEDDING_DIM, encode_embedding
+
+    rng = np.random.default_rng(0)
+    first, second, replaced = (rng.normal(size=EMBEDDING_DIM).astype(np.float32) for _ in range(3))
+    with app.app_context():
+        students = [Student(student_id=f'CC{i}', password='x') for i in range(2)]
+        for student, vector in zip(students, (first, second)):
+            student.embedding_vector = vector
+        db.session.add_all(students)
+        db.session.flush()
+        # Read before the commit, which would otherwise reload them on the writer connection
+        deleted, changed = (student.id for student in students)
+        db.session.commit()
+        app_module.get_face_index()
+        app_module.sync_caches()
+
+        # Another process replaces one embedding and deletes the other row
+        table = Student.__table__
+        with db.engine.begin() as connection:
+            connection.execute(table.update().where(table.c.id == changed).values(
+                embedding_bin=encode_embedding(replaced), embedding=None
+            ))
+            app_module.cache_changes.record(connection, 'faces', changed)
+        with db.engine.begin() as connection:
+            connection.execute(table.delete().where(table.c.id == deleted))
+            app_module.cache_changes.record(connection, 'faces', deleted)
+
+        # The cache-sync thread of an earlier application may be polling too
+        deadline = time.monotonic() + 5
+        while deleted in app_module.face_index:
+            assert time.monotonic() < deadline, 'faces change not applied'
+            app_module.sync_caches()
+            time.sleep(0.01)
+    keys, distances = app_module.face_index.search(replaced, k=1)
+    assert keys[0][0] == changed and distances[0][0] == pytest.approx(0, abs=0.05)
+    assert deleted not in app_module.face_index
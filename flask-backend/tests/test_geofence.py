@@ -0,0 +1,144 @@
+import math
+
+import pytest
+
+from geofence import (MAX_RADIUS_METERS, CircleFence, GeofenceError, GeofenceGrid, check_point,
+                      compile_course_geofence, compile_geofence, parse_coordinate)
+
+# About 100 m north of (30.0, 31.0)
+NORTH_100M = (30.0009, 31.0)
+
+
+def test_circle_reports_distance_to_the_centre():
+    fence = CircleFence(30.0, 31.0, radius=150)
+    inside, distance = check_point(fence, *NORTH_100M)
+    assert inside
+    assert distance == pytest.approx(100.1, abs=0.5)
+    assert not check_point(CircleFence(30.0, 31.0, radius=50), *NORTH_100M)[0]
+
+
+def test_polygon_contains_points_inside_and_within_its_margin():
+    square = {'type': 'polygon', 'points': [[30.0, 31.0], [30.0, 31.001], [30.001, 31.001], [30.001, 31.0]]}
+    fence = compile_geofence(square)
+    assert check_point(fence, 30.0005, 31.0005) == (True, 0.0)
+    outside = (30.0005, 31.0015)  # about 48 m east of the east edge
+    assert not check_point(fence, *outside)[0]
+    assert check_point(compile_geofence(dict(square, margin=60)), *outside)[0]
+
+
+def test_rooms_match_any_room():
+    fence = compile_geofence({'type': 'rooms', 'rooms': [
+        {'lat': 30.0, 'lon': 31.0, 'radius': 20},
+        {'lat': 30.0009, 'lon': 31.0, 'radius': 20},
+    ]})
+    assert check_point(fence, *NORTH_100M)[0]
+    assert not check_point(fence, 30.00045, 31.0)[0]
+
+
+def test_course_without_geofence_uses_its_location_and_radius():
+    fence = compile_course_geofence(None, '30.0, 31.0', 150)
+    assert check_point(fence, *NORTH_100M)[0]
+    with pytest.raises(GeofenceError):
+        compile_course_geofence(None, '', 150)
+
+
+@pytest.mark.parametrize('spec', [
+    {'type': 'hexagon'},
+    {'lat': 30.0, 'lon': 31.0, 'radius': MAX_RADIUS_METERS + 1},
+    {'lat': 30.0, 'lon': 31.0, 'radius': 0},
+    {'type': 'polygon', 'points': [[30.0, 31.0], [30.0, 31.001]]},
+    {'lat': 95.0, 'lon': 31.0},
+    'not json',
+])
+def test_invalid_specs_are_rejected(spec):
+    with pytest.raises(GeofenceError):
+        compile_geofence(spec)
+
+
+@pytest.mark.parametrize('value', [math.nan, math.inf, -math.inf, 'nan', 91, -90.5, None, 'x'])
+def test_parse_coordinate_rejects_non_finite_and_out_of_range(value):
+    with pytest.raises(GeofenceError):
+        parse_coordinate(value, 'latitude')
+
+
+def test_grid_returns_only_nearby_fences():
+    grid = GeofenceGrid()
+    grid.add(1, CircleFence(30.0, 31.0, radius=30))
+    grid.add(2, CircleFence(31.0, 32.0, radius=30))
+    assert [key for key, _ in grid.candidates(30.0, 31.0)] == [1]
+    assert grid.candidates(30.5, 31.5) == []
+    grid.remove(1)
+    assert grid.candidates(30.0, 31.0) == []
+
+
+def test_grid_keeps_huge_fences_in_every_lookup():
+    grid = GeofenceGrid(max_cells=4)
+    grid.add(1, CircleFence(30.0, 31.0, radius=MAX_RADIUS_METERS))
+    assert [key for key, _ in grid.candidates(-10.0, 100.0)] == [1]
+
+
+@pytest.fixture(scope='module')
+def course(app):
+    """An open-able course at (30.0, 31.0) with one enrolled student; returns their ids."""
+    from app import Course, StudentCourse, User, db
+
+    with app.app_context():
+        doctor = User(name='Doctor', email='doctor@geo', password='x', role='doctor', student_id='DGEO')
+        student = User(name='Student', email='s@geo', password='x', role='student', student_id='GEO1')
+        db.session.add_all([doctor, student])
+        db.session.flush()
+        row = Course(name='Geo', code='GEO1', doctor_id=doctor.id, enrollment_code='EGEO1',
+                     location='30.0,31.0')
+        db.session.add(row)
+        db.session.flush()
+        db.session.add(StudentCourse(student_id=student.id, course_id=row.id))
+        db.session.commit()
+        return {'course': row.id, 'student': student.id}
+
+
+def _check_in(client, course):
+    lat, lon = NORTH_100M
+    return client.post('/attendance/verify-location', json={
+        'student_id': course['student'], 'course_id': course['course'], 'latitude': lat, 'longitude': lon
+    })
+
+
+def _locate(client, course):
+    lat, lon = NORTH_100M
+    body = client.post('/attendance/locate', json={
+        'student_id': course['student'], 'latitude': lat, 'longitude': lon
+    }).get_json()
+    return [match['course_id'] for match in body['courses']]
+
+
+@pytest.mark.parametrize('path', ['/attendance/verify-location', '/attendance/locate'])
+@pytest.mark.parametrize('latitude', ['NaN', 'Infinity', '91'])
+def test_bad_student_coordinates_are_400(client, course, path, latitude):
+    body = '{"latitude": %s, "longitude": 31.0, "student_id": %d, "course_id": %d}' % (
+        latitude, course['student'], course['course'])
+    response = client.post(path, data=body, content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_reopening_with_a_new_radius_moves_the_fence(app, client, course):
+    import app as app_module
+    from app import AttendanceSession, db
+
+    url = f'/courses/{course["course"]}/attendance'
+    assert client.put(url, json={'isAttendanceOpen': True, 'radius': 50}).status_code == 200
+    assert not _check_in(client, course).get_json()['success']
+    assert _locate(client, course) == []
+
+    response = client.put(url, json={'isAttendanceOpen': True, 'radius': 200})
+    assert response.get_json()['session']['radius'] == 200
+    assert _check_in(client, course).get_json()['success']
+    assert _locate(client, course) == [course['course']]
+
+    assert app_module.attendance_sessions.flush(timeout=10)
+    with app.app_context():
+        radii = [row.radius for row in db.session.query(AttendanceSession).filter(
+            AttendanceSession.course_id == course['course'],
+            AttendanceSession.closed_at.is_(None)
+        )]
+    assert radii == [200]
+    client.put(url, json={'isAttendanceOpen': False})
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from group_commit import GroupCommitWriter
+
+
+class BlockingFlush:
+    """Records batches; the first one waits for ``release()`` so others queue up behind it."""
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+        self.started = threading.Event()
+        self._release = threading.Event()
+
+    def __call__(self, rows):
+        if not self.batches:
+            self.started.set()
+            self._release.wait(5)
+        if self.fail_on in rows:
+            raise ValueError(f'cannot write {self.fail_on}')
+        self.batches.append(list(rows))
+
+    def release(self):
+        self._release.set()
+
+
+def _queue_behind_first(writer, flush, submissions):
+    first = writer.submit('first')
+    assert flush.started.wait(5)
+    futures = [writer.submit_many(rows) for rows in submissions]
+    flush.release()
+    assert first.result(5) == 1
+    return futures
+
+
+def test_queued_submissions_share_one_commit():
+    flush = BlockingFlush()
+    writer = GroupCommitWriter(flush, max_batch=256, max_delay=0.05)
+    futures = _queue_behind_first(writer, flush, [[i] for i in range(10)] + [[10, 11]])
+
+    assert [future.result(5) for future in futures] == [1] * 10 + [2]
+    assert flush.batches == [['first'], list(range(12))]
+    assert writer.stats()['batches'] == 2
+
+
+def test_batches_stop_at_max_batch():
+    flush = BlockingFlush()
+    writer = GroupCommitWriter(flush, max_batch=4, max_delay=0.05)
+    futures = _queue_behind_first(writer, flush, [[i] for i in range(10)])
+
+    for future in futures:
+        future.result(5)
+    assert [len(batch) for batch in flush.batches] == [1, 4, 4, 2]
+
+
+def test_a_failing_submission_only_fails_its_own_future():
+    flush = BlockingFlush(fail_on='bad')
+    writer = GroupCommitWriter(flush, max_delay=0.05)
+    good, bad, other = _queue_behind_first(writer, flush, [['a'], ['bad'], ['c']])
+
+    assert good.result(5) == 1
+    assert other.result(5) == 1
+    with pytest.raises(ValueError):
+        bad.result(5)
+    assert flush.batches == [['first'], ['a'], ['c']]
+    assert writer.flush(timeout=5)
+
+
+def test_batch_check_ins_are_committed_by_the_location_writer(app, client):
+    import app as app_module
+    from app import Course, StudentCourse, StudentLocation, User, db
+
+    with app.app_context():
+        doctor = User(name='Doctor', email='doctor@gc', password='x', role='doctor', student_id='DGC')
+        students = [User(name=f'Student {i}', email=f's{i}@gc', password='x', role='student',
+                         student_id=f'GC{i}') for i in range(3)]
+        db.session.add_all([doctor] + students)
+        db.session.flush()
+        course = Course(name='GC', code='GC1', doctor_id=doctor.id, enrollment_code='EGC1',
+                        location='30.0,31.0')
+        db.session.add(course)
+        db.session.flush()
+        db.session.add_all([StudentCourse(student_id=s.id, course_id=course.id) for s in students])
+        db.session.commit()
+        course_id, student_ids = course.id, [s.id for s in students]
+
+    assert client.put(f'/courses/{course_id}/attendance', json={'isAttendanceOpen': True}).status_code == 200
+    batches = app_module.location_writer.batches
+    response = client.post('/attendance/verify-location/batch', json={'course_id': course_id, 'records': [
+        {'student_id': student_id, 'latitude': 30.0, 'longitude': 31.0} for student_id in student_ids
+    ]})
+    assert response.status_code == 200
+    assert all(result['success'] for result in response.get_json()['results'])
+    assert app_module.location_writer.flush(timeout=10)
+
+    assert app_module.location_writer.batches == batches + 1
+    with app.app_context():
+        rows = db.session.query(StudentLocation.student_id).filter(
+            StudentLocation.course_id == course_id
+        ).all()
+    assert sorted(row.student_id for row in rows) == student_ids
@@ -0,0 +1,126 @@
+import pytest
+
+from pagination import PaginationError, decode_cursor, encode_cursor
+
+
+@pytest.fixture(scope='module')
+def roster(app):
+    """A doctor with one course of 25 students, plus 12 locations; returns their ids."""
+    from app import Course, Location, StudentCourse, User, db
+
+    with app.app_context():
+        doctor = User(name='Doctor', email='doctor@page', password='x', role='doctor', student_id='DPG')
+        db.session.add(doctor)
+        db.session.flush()
+        students = [User(name=f'Student {i}', email=f's{i}@page', password='x', role='student',
+                         student_id=f'PG{i}') for i in range(25)]
+        course = Course(name='Paged', code='PG1', doctor_id=doctor.id, enrollment_code='EPG1')
+        db.session.add_all(students + [course])
+        db.session.flush()
+        # Enrolled in reverse so insertion order differs from key order
+        for student in reversed(students):
+            db.session.add(StudentCourse(student_id=student.id, course_id=course.id))
+        db.session.add_all([Location(name=f'L{i}', location='30.0,31.0') for i in range(12)])
+        db.session.commit()
+        return {'course': course.id, 'students': sorted(student.id for student in students)}
+
+
+@pytest.fixture
+def page_config(app, monkeypatch):
+    """Set page config for one test; cached list responses were built with the old one."""
+    from app import response_cache
+
+    def configure(**values):
+        response_cache.clear()
+        for name, value in values.items():
+            monkeypatch.setitem(app.config, name, value)
+
+    yield configure
+    response_cache.clear()
+
+
+def walk(client, url, key, limit):
+    """Follow the cursor to the last page; returns (items, pages)."""
+    items, cursor, pages = [], None, 0
+    while True:
+        query = {'limit': limit}
+        if cursor:
+            query['cursor'] = cursor
+        response = client.get(url, query_string=query)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        body = response.get_json()
+        pages += 1
+        if key is None:
+            items += body
+            cursor = response.headers.get('X-Next-Cursor')
+        else:
+            items += body[key]
+            cursor = body.get('next_cursor')
+        if not cursor:
+            return items, pages
+
+
+def test_cursor_round_trip():
+    for key in (0, 1, 123456789):
+        assert decode_cursor(encode_cursor(key)) == key
+
+
+@pytest.mark.parametrize('token', ['@@', 'bm90LWpzb24', encode_cursor('7'), encode_cursor(True)])
+def test_invalid_cursor_is_rejected(token):
+    with pytest.raises(PaginationError):
+        decode_cursor(token)
+
+
+def test_pages_cover_every_row_once_in_key_order(client, roster):
+    students, pages = walk(client, f'/courses/{roster["course"]}/students', 'students', 4)
+    assert [student['id'] for student in students] == roster['students']
+    assert pages == 7
+
+
+def test_data_cursor_is_sent_in_a_header(client, roster):
+    locations, pages = walk(client, '/data', None, 5)
+    ids = [location['id'] for location in locations]
+    assert ids == sorted(set(ids)) and len(ids) == 12
+    assert pages == 3
+
+
+def test_deleting_a_returned_row_does_not_skip_the_next_page(app, client, roster):
+    from app import Location, db
+
+    first = client.get('/data', query_string={'limit': 3})
+    seen = [location['id'] for location in first.get_json()]
+    with app.app_context():
+        db.session.delete(db.session.get(Location, seen[0]))
+        db.session.commit()
+    second = client.get('/data', query_string={'limit': 3, 'cursor': first.headers['X-Next-Cursor']})
+    assert second.get_json()[0]['id'] == seen[-1] + 1
+
+
+def test_default_limit_applies_without_limit_or_cursor(client, roster, page_config):
+    page_config(PAGE_DEFAULT_LIMIT=10)
+    body = client.get(f'/courses/{roster["course"]}/students').get_json()
+    assert len(body['students']) == 10
+    assert 'next_cursor' in body
+
+
+def test_unbounded_default_is_an_explicit_opt_in(client, roster, page_config):
+    page_config(PAGE_DEFAULT_LIMIT=10, PAGE_UNBOUNDED_DEFAULT=True)
+    body = client.get(f'/courses/{roster["course"]}/students').get_json()
+    assert len(body['students']) == 25
+    assert 'next_cursor' not in body
+    # A cursor still gets pages of the default size
+    paged = client.get(f'/courses/{roster["course"]}/students',
+                       query_string={'cursor': encode_cursor(0)}).get_json()
+    assert len(paged['students']) == 10
+
+
+def test_fields_select_a_projection(client, roster):
+    body = client.get(f'/courses/{roster["course"]}/students',
+                      query_string={'limit': 2, 'fields': 'id,name'}).get_json()
+    assert [sorted(student) for student in body['students']] == [['id', 'name'], ['id', 'name']]
+
+
+@pytest.mark.parametrize('query', [{'limit': 0}, {'limit': 'x'}, {'limit': 5000},
+                                   {'cursor': '@@'}, {'fields': 'password'}])
+def test_bad_page_arguments_are_400(client, roster, query):
+    assert client.get(f'/courses/{roster["course"]}/students', query_string=query).status_code == 400
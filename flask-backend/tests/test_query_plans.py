@@ -0,0 +1,22 @@
+import pytest
+
+import check_query_plans
+
+pytestmark = pytest.mark.usefixtures('fresh_process')
+
+
+def _check(database_url):
+    failures = check_query_plans.run(database_url)
+    assert not failures, '\n'.join(failures)
+
+
+def test_sqlite_hot_statements_use_indexes(tmp_path):
+    _check(f'sqlite:///{tmp_path / "plans.db"}')
+
+
+def test_postgresql_hot_statements_use_indexes(postgres_engine):
+    import app as app_module
+
+    # run() seeds fixed ids, so it needs empty tables
+    app_module.db.metadata.drop_all(postgres_engine)
+    _check(postgres_engine.url.render_as_string(hide_password=False))
@@ -0,0 +1,5 @@
+from app import create_app
+
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# Migrations run through `flask db`, so serving skips loading Flask-Migrate/alembic
+app = create_app({'ENABLE_MIGRATIONS': False})
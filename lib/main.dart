@@ -160,14 +160,21 @@ class _DataListState extends State<DataList> {
   }
 
   fetchData() async {
-    final response = await http.get(Uri.parse('http://localhost:5000/data'));
-    if (response.statusCode == 200) {
-      setState(() {
-        data = json.decode(response.body);
-      });
-    } else {
-      throw Exception('Failed to load data');
-    }
+    // Paged; the next page's cursor comes in the X-Next-Cursor header
+    final items = [];
+    String? cursor;
+    do {
+      final response = await http.get(Uri.parse('http://localhost:5000/data')
+          .replace(queryParameters: cursor == null ? null : {'cursor': cursor}));
+      if (response.statusCode != 200) {
+        throw Exception('Failed to load data');
+      }
+      items.addAll(json.decode(response.body));
+      cursor = response.headers['x-next-cursor'];
+    } while (cursor != null);
+    setState(() {
+      data = items;
+    });
   }
 
   @override
@@ -9,21 +9,29 @@ class ApiService {
   static const String baseUrl =
       'http://192.168.1.68:5000'; // يتصل بالـ Flask server
 
+  // /data is paged; the next page's cursor comes in the X-Next-Cursor header
   Future<List<dynamic>> fetchData() async {
     try {
       print('Attempting to fetch data from: $baseUrl/data');
-      final response = await http.get(
-        Uri.parse('$baseUrl/data'),
-        headers: {'Content-Type': 'application/json'},
-      );
-      print('Response status code: ${response.statusCode}');
-      print('Response body: ${response.body}');
+      final items = <dynamic>[];
+      String? cursor;
+      do {
+        final response = await http.get(
+          Uri.parse('$baseUrl/data').replace(
+            queryParameters: cursor == null ? null : {'cursor': cursor},
+          ),
+          headers: {'Content-Type': 'application/json'},
+        );
+        print('Response status code: ${response.statusCode}');
+        print('Response body: ${response.body}');
 
-      if (response.statusCode == 200) {
-        return json.decode(response.body);
-      } else {
-        throw Exception('Server error: ${response.statusCode}');
-      }
+        if (response.statusCode != 200) {
+          throw Exception('Server error: ${response.statusCode}');
+        }
+        items.addAll(json.decode(response.body));
+        cursor = response.headers['x-next-cursor'];
+      } while (cursor != null);
+      return items;
     } catch (e) {
       print('Network error: $e');
       throw Exception('Network error: $e');
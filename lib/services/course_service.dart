@@ -11,26 +11,41 @@ class CourseService {
     return 'http://192.168.1.68:5000';
   }
 
-  Future<Map<String, dynamic>> getDoctorCourses(dynamic doctorId) async {
-    try {
+  // The course lists are paged; follow next_cursor until the last page
+  Future<Map<String, dynamic>> _getAllCourses(
+      String path, String errorMessage) async {
+    final courses = <dynamic>[];
+    String? cursor;
+    do {
       final response = await http.get(
-        Uri.parse('$baseUrl/courses/doctor/$doctorId'),
+        Uri.parse('$baseUrl$path').replace(
+          queryParameters: cursor == null ? null : {'cursor': cursor},
+        ),
         headers: {'Content-Type': 'application/json'},
       );
 
       final data = json.decode(response.body);
 
-      if (response.statusCode == 200) {
-        return {
-          'success': true,
-          'courses': data['courses'],
-        };
-      } else {
+      if (response.statusCode != 200) {
         return {
           'success': false,
-          'message': data['message'] ?? 'Failed to load courses',
+          'message': data['message'] ?? errorMessage,
         };
       }
+      courses.addAll(data['courses']);
+      cursor = data['next_cursor'];
+    } while (cursor != null);
+
+    return {
+      'success': true,
+      'courses': courses,
+    };
+  }
+
+  Future<Map<String, dynamic>> getDoctorCourses(dynamic doctorId) async {
+    try {
+      return await _getAllCourses(
+          '/courses/doctor/$doctorId', 'Failed to load courses');
     } catch (e) {
       print('Error getting doctor courses: $e');
       return {
@@ -45,24 +60,8 @@ class CourseService {
       // Convert studentId to string if it's not already
       final studentIdStr = studentId.toString();
 
-      final response = await http.get(
-        Uri.parse('$baseUrl/courses/student/$studentIdStr'),
-        headers: {'Content-Type': 'application/json'},
-      );
-
-      final data = json.decode(response.body);
-
-      if (response.statusCode == 200) {
-        return {
-          'success': true,
-          'courses': data['courses'],
-        };
-      } else {
-        return {
-          'success': false,
-          'message': data['message'] ?? 'Failed to load courses',
-        };
-      }
+      return await _getAllCourses(
+          '/courses/student/$studentIdStr', 'Failed to load courses');
     } catch (e) {
       print('Error getting student courses: $e');
       return {